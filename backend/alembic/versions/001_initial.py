@@ -19,6 +19,10 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
+    # The whole upgrade runs in one transaction; skip waiting for the WAL
+    # flush on its commit. Mostly helps CI and local resets.
+    op.execute("SET LOCAL synchronous_commit = off")
+
     # Users table
     op.create_table(
         'users',
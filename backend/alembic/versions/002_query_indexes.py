@@ -0,0 +1,46 @@
+"""Add indexes matching document listing and expense report queries
+
+Revision ID: 002_query_indexes
+Revises: 001_initial
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002_query_indexes'
+down_revision: Union[str, None] = '001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Document listing: newest first per user
+    op.create_index(
+        'ix_documents_user_created',
+        'documents',
+        ['user_id', sa.text('created_at DESC')],
+    )
+    # Expense reports (by-vendor breakdown) only ever read expense rows
+    op.create_index(
+        'ix_ledger_entries_expense_user_date',
+        'ledger_entries',
+        ['user_id', 'entry_date'],
+        postgresql_where=sa.text("direction = 'expense'"),
+    )
+
+    # user_id lookups are covered by the leading column of
+    # ix_documents_user_status and ix_ledger_entries_user_date
+    op.drop_index('ix_documents_user_id', table_name='documents')
+    op.drop_index('ix_ledger_entries_user_id', table_name='ledger_entries')
+
+
+def downgrade() -> None:
+    op.create_index('ix_ledger_entries_user_id', 'ledger_entries', ['user_id'])
+    op.create_index('ix_documents_user_id', 'documents', ['user_id'])
+    op.drop_index('ix_ledger_entries_expense_user_date', table_name='ledger_entries')
+    op.drop_index('ix_documents_user_created', table_name='documents')
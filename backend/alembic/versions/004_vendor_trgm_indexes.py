@@ -0,0 +1,42 @@
+"""Add trigram indexes for vendor name matching
+
+Revision ID: 004_vendor_trgm_indexes
+Revises: 003_brin_indexes
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004_vendor_trgm_indexes'
+down_revision: Union[str, None] = '003_brin_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Substring/fuzzy search on normalized names (LIKE '%...%', similarity)
+    op.create_index(
+        'ix_vendors_normalized_name_trgm',
+        'vendors',
+        ['normalized_name'],
+        postgresql_using='gin',
+        postgresql_ops={'normalized_name': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_vendor_aliases_normalized_alias_trgm',
+        'vendor_aliases',
+        ['normalized_alias'],
+        postgresql_using='gin',
+        postgresql_ops={'normalized_alias': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_vendor_aliases_normalized_alias_trgm', table_name='vendor_aliases')
+    op.drop_index('ix_vendors_normalized_name_trgm', table_name='vendors')
@@ -0,0 +1,27 @@
+"""Add index for duplicate upload lookup
+
+Revision ID: 005_document_sha256_index
+Revises: 004_vendor_trgm_indexes
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_document_sha256_index'
+down_revision: Union[str, None] = '004_vendor_trgm_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Uploads look up an existing draft by file hash before running OCR
+    op.create_index('ix_documents_user_sha256', 'documents', ['user_id', 'image_sha256'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_user_sha256', table_name='documents')
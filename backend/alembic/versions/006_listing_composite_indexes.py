@@ -0,0 +1,60 @@
+"""Add composite indexes matching filtered listings
+
+Revision ID: 006_listing_composite_indexes
+Revises: 005_document_sha256_index
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_listing_composite_indexes'
+down_revision: Union[str, None] = '005_document_sha256_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Equality filter first, then the sort column, so listings walk the
+    # index in order instead of sorting the matches
+    op.create_index(
+        'ix_ledger_entries_vendor_date',
+        'ledger_entries',
+        ['vendor_id', sa.text('entry_date DESC')],
+    )
+    op.create_index(
+        'ix_ledger_entries_category_date',
+        'ledger_entries',
+        ['category_id', sa.text('entry_date DESC')],
+    )
+    op.create_index(
+        'ix_documents_user_status_created',
+        'documents',
+        ['user_id', 'status', sa.text('created_at DESC')],
+    )
+    op.create_index(
+        'ix_documents_status_created',
+        'documents',
+        ['status', sa.text('created_at DESC')],
+    )
+
+    # Superseded by the leading columns of the indexes above
+    op.drop_index('ix_ledger_entries_vendor_id', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_category_id', table_name='ledger_entries')
+    op.drop_index('ix_documents_user_status', table_name='documents')
+    op.drop_index('ix_documents_status', table_name='documents')
+
+
+def downgrade() -> None:
+    op.create_index('ix_documents_status', 'documents', ['status'])
+    op.create_index('ix_documents_user_status', 'documents', ['user_id', 'status'])
+    op.create_index('ix_ledger_entries_category_id', 'ledger_entries', ['category_id'])
+    op.create_index('ix_ledger_entries_vendor_id', 'ledger_entries', ['vendor_id'])
+    op.drop_index('ix_documents_status_created', table_name='documents')
+    op.drop_index('ix_documents_user_status_created', table_name='documents')
+    op.drop_index('ix_ledger_entries_category_date', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_vendor_date', table_name='ledger_entries')
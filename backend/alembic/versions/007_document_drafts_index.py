@@ -0,0 +1,32 @@
+"""Add partial index for the per-user draft queue
+
+Revision ID: 007_document_drafts_index
+Revises: 006_listing_composite_indexes
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_document_drafts_index'
+down_revision: Union[str, None] = '006_listing_composite_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Drafts awaiting confirmation, newest first per user
+    op.create_index(
+        'ix_documents_user_drafts',
+        'documents',
+        ['user_id', sa.text('created_at DESC')],
+        postgresql_where=sa.text("status = 'draft'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_user_drafts', table_name='documents')
@@ -0,0 +1,33 @@
+"""Add covering index for period summaries
+
+Revision ID: 008_ledger_summary_index
+Revises: 007_document_drafts_index
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_ledger_summary_index'
+down_revision: Union[str, None] = '007_document_drafts_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # /reports/summary sums amount and tax_amount per direction over a date
+    # range; INCLUDE makes that an index-only scan
+    op.create_index(
+        'ix_ledger_entries_date_direction',
+        'ledger_entries',
+        ['entry_date', 'direction'],
+        postgresql_include=['amount', 'tax_amount'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ledger_entries_date_direction', table_name='ledger_entries')
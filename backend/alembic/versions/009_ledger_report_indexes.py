@@ -0,0 +1,41 @@
+"""Add covering indexes for the vendor breakdown and per-user report
+
+Revision ID: 009_ledger_report_indexes
+Revises: 008_ledger_summary_index
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_ledger_report_indexes'
+down_revision: Union[str, None] = '008_ledger_summary_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # /reports/by-vendor: expense rows since a date, grouped by vendor
+    op.create_index(
+        'ix_ledger_entries_expense_date_vendor',
+        'ledger_entries',
+        ['entry_date', 'vendor_id'],
+        postgresql_include=['amount'],
+        postgresql_where=sa.text("direction = 'expense'"),
+    )
+    # Telegram /report: a user's totals per direction
+    op.create_index(
+        'ix_ledger_entries_user_direction',
+        'ledger_entries',
+        ['user_id', 'direction'],
+        postgresql_include=['amount'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ledger_entries_user_direction', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_expense_date_vendor', table_name='ledger_entries')
@@ -0,0 +1,50 @@
+"""Cover per-user period totals with ix_ledger_entries_user_date
+
+Revision ID: 010_ledger_user_totals_index
+Revises: 009_ledger_report_indexes
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010_ledger_user_totals_index'
+down_revision: Union[str, None] = '009_ledger_report_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # /reports/summary and /report now filter by user and date range, so the
+    # unscoped (entry_date, direction) and dateless (user_id, direction)
+    # indexes are no longer used; (user_id, entry_date) covers both instead
+    op.drop_index('ix_ledger_entries_user_direction', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_date_direction', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_user_date', table_name='ledger_entries')
+    op.create_index(
+        'ix_ledger_entries_user_date',
+        'ledger_entries',
+        ['user_id', 'entry_date'],
+        postgresql_include=['direction', 'amount', 'tax_amount'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ledger_entries_user_date', table_name='ledger_entries')
+    op.create_index('ix_ledger_entries_user_date', 'ledger_entries', ['user_id', 'entry_date'])
+    op.create_index(
+        'ix_ledger_entries_date_direction',
+        'ledger_entries',
+        ['entry_date', 'direction'],
+        postgresql_include=['amount', 'tax_amount'],
+    )
+    op.create_index(
+        'ix_ledger_entries_user_direction',
+        'ledger_entries',
+        ['user_id', 'direction'],
+        postgresql_include=['amount'],
+    )
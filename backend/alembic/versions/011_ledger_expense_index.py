@@ -0,0 +1,50 @@
+"""Cover the per-user vendor breakdown with the expense partial index
+
+Revision ID: 011_ledger_expense_index
+Revises: 010_ledger_user_totals_index
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011_ledger_expense_index'
+down_revision: Union[str, None] = '010_ledger_user_totals_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # /reports/by-vendor is now scoped to the user, so the unscoped
+    # (entry_date, vendor_id) index is replaced by a covering version of
+    # the per-user expense index
+    op.drop_index('ix_ledger_entries_expense_date_vendor', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_expense_user_date', table_name='ledger_entries')
+    op.create_index(
+        'ix_ledger_entries_expense_user_date',
+        'ledger_entries',
+        ['user_id', 'entry_date'],
+        postgresql_include=['vendor_id', 'amount'],
+        postgresql_where=sa.text("direction = 'expense'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ledger_entries_expense_user_date', table_name='ledger_entries')
+    op.create_index(
+        'ix_ledger_entries_expense_user_date',
+        'ledger_entries',
+        ['user_id', 'entry_date'],
+        postgresql_where=sa.text("direction = 'expense'"),
+    )
+    op.create_index(
+        'ix_ledger_entries_expense_date_vendor',
+        'ledger_entries',
+        ['entry_date', 'vendor_id'],
+        postgresql_include=['amount'],
+        postgresql_where=sa.text("direction = 'expense'"),
+    )
@@ -0,0 +1,44 @@
+"""Add trigram indexes for vendor display name and VKN search
+
+Revision ID: 012_vendor_search_trgm
+Revises: 011_ledger_expense_index
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '012_vendor_search_trgm'
+down_revision: Union[str, None] = '011_ledger_expense_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Vendor list/autocomplete match display_name with ILIKE '%...%' and VKN
+    # with LIKE '%...%'; with normalized_name (004) every branch of the OR
+    # can use a trigram index instead of a sequential scan
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_vendors_display_name_trgm',
+        'vendors',
+        ['display_name'],
+        postgresql_using='gin',
+        postgresql_ops={'display_name': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_vendors_vkn_trgm',
+        'vendors',
+        ['vkn'],
+        postgresql_using='gin',
+        postgresql_ops={'vkn': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_vendors_vkn_trgm', table_name='vendors')
+    op.drop_index('ix_vendors_display_name_trgm', table_name='vendors')
@@ -0,0 +1,51 @@
+"""Make vendor VKN unique per user
+
+Revision ID: 013_vendor_vkn_unique
+Revises: 012_vendor_search_trgm
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013_vendor_vkn_unique'
+down_revision: Union[str, None] = '012_vendor_search_trgm'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Vendors created by the matcher or the seed never went through
+    # create_vendor's VKN check, so a user may already have duplicates.
+    # Name them instead of failing on a bare unique violation; they have to
+    # be merged (or their VKN cleared) by hand before rerunning
+    if not context.is_offline_mode():
+        duplicates = op.get_bind().execute(sa.text(
+            "SELECT user_id, vkn, string_agg(id::text, ', ' ORDER BY created_at) AS ids "
+            "FROM vendors WHERE vkn IS NOT NULL "
+            "GROUP BY user_id, vkn HAVING count(*) > 1"
+        )).all()
+        if duplicates:
+            raise RuntimeError(
+                "Cannot add uq_vendors_user_vkn, vendors share a VKN:\n"
+                + "\n".join(
+                    f"  user {row.user_id}, VKN {row.vkn}: vendors {row.ids}"
+                    for row in duplicates
+                )
+            )
+    
+    # create_vendor relies on INSERT ... ON CONFLICT (user_id, vkn) instead
+    # of checking for the VKN first; NULL VKNs never conflict
+    op.create_unique_constraint(
+        'uq_vendors_user_vkn',
+        'vendors',
+        ['user_id', 'vkn'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_vendors_user_vkn', 'vendors', type_='unique')
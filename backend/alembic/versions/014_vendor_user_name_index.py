@@ -0,0 +1,36 @@
+"""Add per-user vendor listing index
+
+Revision ID: 014_vendor_user_name_index
+Revises: 013_vendor_vkn_unique
+Create Date: 2026-10-15
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '014_vendor_user_name_index'
+down_revision: Union[str, None] = '013_vendor_vkn_unique'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The vendor list filters on user_id and sorts by display_name; with
+    # both in one index the LIMIT page is read in order without a sort
+    op.create_index(
+        'ix_vendors_user_display_name',
+        'vendors',
+        ['user_id', 'display_name'],
+    )
+
+    # Superseded by the leading column of the index above
+    op.drop_index('ix_vendors_user_id', table_name='vendors')
+
+
+def downgrade() -> None:
+    op.create_index('ix_vendors_user_id', 'vendors', ['user_id'])
+    op.drop_index('ix_vendors_user_display_name', table_name='vendors')
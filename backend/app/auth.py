@@ -0,0 +1,14 @@
+"""
+Resolution of the user a request acts for.
+"""
+import uuid
+from typing import Final
+
+# Single-user deployment until real authentication lands
+DEFAULT_USER_ID: Final[uuid.UUID] = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+
+async def get_current_user_id() -> uuid.UUID:
+    """Dependency returning the id of the requesting user."""
+    # TODO: get from auth
+    return DEFAULT_USER_ID
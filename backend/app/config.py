@@ -34,6 +34,16 @@ class Settings(BaseSettings):
             url = url.replace("postgres://", "postgresql+asyncpg://", 1)
         return url
     
+    # Connection pool (per worker process); keep workers * (size + overflow)
+    # below the server's max_connections
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 10.0
+    db_pool_recycle: int = 1800
+    
+    # Rate limiting (shared across workers when set, in-memory otherwise)
+    redis_url: Optional[str] = None
+    
     # CORS - include production domains by default
     allowed_origins: str = "http://localhost:3000,https://muhasebe-liart.vercel.app"
     
@@ -47,6 +57,8 @@ class Settings(BaseSettings):
     
     # File Storage
     upload_dir: str = "uploads"
+    # Disable when a reverse proxy/CDN serves upload_dir at /uploads
+    serve_uploads: bool = True
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
     
     # Optional: Cloudinary
@@ -1,8 +1,12 @@
 """
 Database connection and session management.
 """
+import os
+import time
+import uuid
 from typing import AsyncGenerator
 
+from sqlalchemy import DDL, event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
@@ -15,8 +19,15 @@ engine = create_async_engine(
     settings.async_database_url,  # Uses property to convert URL format
     echo=settings.debug,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    # Fail fast instead of queueing requests behind an exhausted pool
+    pool_timeout=settings.db_pool_timeout,
+    # Replace connections before server/proxy idle timeouts drop them
+    pool_recycle=settings.db_pool_recycle,
+    # Room for every distinct statement shape the routers emit, so compiled
+    # SQL is reused instead of being evicted and recompiled under load
+    query_cache_size=1200,
 )
 
 # Session factory
@@ -34,6 +45,28 @@ class Base(DeclarativeBase):
     pass
 
 
+# Trigram indexes on vendor names need pg_trgm before create_all runs
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+)
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a time-ordered UUIDv7 (RFC 9562).
+    Keys created close together land on the same B-tree leaf, unlike uuid4.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= int.from_bytes(os.urandom(10), "big")
+    # Version 7 and RFC 4122 variant bits
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependency to get database session."""
     async with async_session_maker() as session:
@@ -1,6 +1,7 @@
 """
 Kişisel Muhasebe API - FastAPI Application
 """
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -11,6 +12,8 @@ import structlog
 
 from app.config import get_settings
 from app.database import init_db
+from app.middleware import close_rate_limiter, purge_idle_keys_periodically
+from app.services.ocr_service import get_ocr_service
 from app.routers import (
     health_router,
     documents_router,
@@ -19,6 +22,7 @@ from app.routers import (
     reports_router,
     telegram_router,
 )
+from app.routers.telegram import http_client as telegram_http_client
 
 # Configure structured logging
 structlog.configure(
@@ -45,8 +49,17 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Muhasebe API", debug=settings.debug)
     await init_db()
+    # Locate Tesseract and probe its languages now rather than on the first upload
+    await asyncio.to_thread(get_ocr_service)
+    purge_task = None
+    if not settings.debug:
+        purge_task = asyncio.create_task(purge_idle_keys_periodically())
     yield
     # Shutdown
+    if purge_task:
+        purge_task.cancel()
+    await telegram_http_client.aclose()
+    await close_rate_limiter()
     logger.info("Shutting down Muhasebe API")
 
 
@@ -75,20 +88,13 @@ from app.middleware import setup_exception_handlers, log_request_middleware, rat
 # Setup exception handlers
 setup_exception_handlers(app)
 
-# Add request logging middleware
-app.middleware("http")(log_request_middleware)
-
-@app.middleware("http")
-async def log_cors_headers(request, call_next):
-    origin = request.headers.get("origin")
-    logger.info(f"CORS Debug - Origin: {origin}, Allowed: {settings.cors_origins}")
-    response = await call_next(request)
-    return response
-
 # Add rate limiting middleware (disable in debug mode)
 if not settings.debug:
     app.middleware("http")(rate_limit_middleware)
 
+# Add request logging middleware (registered last so it runs first)
+app.middleware("http")(log_request_middleware)
+
 # Include routers
 app.include_router(health_router)
 app.include_router(documents_router)
@@ -97,13 +103,14 @@ app.include_router(ledger_router)
 app.include_router(reports_router)
 app.include_router(telegram_router)
 
-# Serve uploaded files (development only)
-# Serve uploaded files (always enabled for local storage)
-import os
-upload_path = settings.upload_dir
-if not os.path.exists(upload_path):
-    os.makedirs(upload_path, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=upload_path), name="uploads")
+# Serve uploaded files for local storage. Behind Nginx/CDN set
+# SERVE_UPLOADS=false and let the proxy serve upload_dir directly.
+if settings.serve_uploads:
+    import os
+    upload_path = settings.upload_dir
+    if not os.path.exists(upload_path):
+        os.makedirs(upload_path, exist_ok=True)
+    app.mount("/uploads", StaticFiles(directory=upload_path), name="uploads")
 
 
 if __name__ == "__main__":
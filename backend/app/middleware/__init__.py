@@ -2,12 +2,22 @@
 Middleware package.
 """
 from app.middleware.error_handler import setup_exception_handlers, log_request_middleware
-from app.middleware.rate_limiter import rate_limit_middleware, RateLimiter, RateLimitConfig
+from app.middleware.rate_limiter import (
+    rate_limit_middleware,
+    purge_idle_keys_periodically,
+    close_rate_limiter,
+    RateLimiter,
+    RedisRateLimiter,
+    RateLimitConfig,
+)
 
 __all__ = [
     "setup_exception_handlers",
     "log_request_middleware",
     "rate_limit_middleware",
+    "purge_idle_keys_periodically",
+    "close_rate_limiter",
     "RateLimiter",
+    "RedisRateLimiter",
     "RateLimitConfig",
 ]
@@ -5,12 +5,34 @@ import logging
 import traceback
 from typing import Callable
 
+import structlog
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from pydantic import ValidationError
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.responses import ORJSONResponse, prebuilt_json
+
 logger = logging.getLogger(__name__)
+# Request log lines go through structlog so fields are rendered as-is
+request_logger = structlog.get_logger("app.requests")
+
+# Requests under these prefixes (static files, API docs) are not logged
+QUIET_PREFIXES = ("/uploads/", "/static/", "/docs", "/redoc", "/openapi")
+
+# Error bodies without dynamic fields, serialized once
+_DATABASE_ERROR_BODY = prebuilt_json({
+    "error": {
+        "code": "DATABASE_ERROR",
+        "message": "Veritabanı hatası oluştu",
+    }
+})
+_INTERNAL_ERROR_BODY = prebuilt_json({
+    "error": {
+        "code": "INTERNAL_ERROR",
+        "message": "Beklenmeyen bir hata oluştu",
+    }
+})
 
 
 class AppException(Exception):
@@ -92,7 +114,7 @@ def setup_exception_handlers(app: FastAPI) -> None:
             f"AppException: {exc.code} - {exc.message}",
             extra={"details": exc.details, "path": request.url.path},
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 "error": {
@@ -107,7 +129,7 @@ def setup_exception_handlers(app: FastAPI) -> None:
     async def validation_exception_handler(request: Request, exc: ValidationError):
         """Handle Pydantic validation errors."""
         logger.warning(f"Validation error: {exc.errors()}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             content={
                 "error": {
@@ -122,14 +144,10 @@ def setup_exception_handlers(app: FastAPI) -> None:
     async def database_exception_handler(request: Request, exc: SQLAlchemyError):
         """Handle database errors."""
         logger.error(f"Database error: {exc}", exc_info=True)
-        return JSONResponse(
+        return Response(
+            content=_DATABASE_ERROR_BODY,
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={
-                "error": {
-                    "code": "DATABASE_ERROR",
-                    "message": "Veritabanı hatası oluştu",
-                }
-            },
+            media_type="application/json",
         )
 
     @app.exception_handler(Exception)
@@ -140,39 +158,44 @@ def setup_exception_handlers(app: FastAPI) -> None:
             exc_info=True,
             extra={"traceback": traceback.format_exc()},
         )
-        return JSONResponse(
+        return Response(
+            content=_INTERNAL_ERROR_BODY,
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={
-                "error": {
-                    "code": "INTERNAL_ERROR",
-                    "message": "Beklenmeyen bir hata oluştu",
-                }
-            },
+            media_type="application/json",
         )
 
 
 async def log_request_middleware(request: Request, call_next: Callable):
-    """Middleware to log all requests."""
+    """
+    Middleware to log all requests.
+    Registered outermost so it also stashes the path and client IP on
+    request.state for the middlewares that run after it.
+    """
     import time
 
-    start_time = time.time()
+    path = request.state.path = request.url.path
+    client_ip = request.state.client_ip = request.client.host if request.client else None
+
+    # Static files and docs assets are not worth a log line each
+    if path.startswith(QUIET_PREFIXES):
+        return await call_next(request)
+
+    start_time = time.monotonic()
     
     # Process request
     response = await call_next(request)
     
     # Calculate duration
-    duration = time.time() - start_time
+    duration = time.monotonic() - start_time
     
     # Log request
-    logger.info(
-        f"{request.method} {request.url.path}",
-        extra={
-            "method": request.method,
-            "path": request.url.path,
-            "status_code": response.status_code,
-            "duration_ms": round(duration * 1000, 2),
-            "client_ip": request.client.host if request.client else None,
-        },
+    request_logger.info(
+        "request",
+        method=request.method,
+        path=path,
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 2),
+        client_ip=client_ip,
     )
     
     return response
@@ -1,14 +1,25 @@
 """
-Rate limiting middleware using in-memory sliding window.
+Rate limiting middleware.
+Uses Redis fixed-window counters when REDIS_URL is configured (shared across
+workers), otherwise in-memory token buckets.
 """
 import asyncio
+import logging
+import math
 import time
-from collections import defaultdict
 from dataclasses import dataclass
 from typing import Callable
 
 from fastapi import Request, status
-from fastapi.responses import JSONResponse
+
+from app.config import get_settings
+from app.responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Paths that are never rate limited
+SKIP_PATHS = frozenset({"/health", "/", "/docs", "/redoc", "/openapi.json"})
+SKIP_PREFIXES = ("/uploads/", "/static/")
 
 
 @dataclass
@@ -21,97 +32,239 @@ class RateLimitConfig:
 
 class RateLimiter:
     """
-    In-memory rate limiter using sliding window.
+    In-memory rate limiter using token buckets.
+    Each key keeps one bucket per window (second/minute/hour), refilled
+    continuously, so memory per client is constant regardless of traffic.
     For production, use Redis-based rate limiting.
     """
 
     def __init__(self, config: RateLimitConfig | None = None):
         self.config = config or RateLimitConfig()
-        self._minute_windows: dict[str, list[float]] = defaultdict(list)
-        self._hour_windows: dict[str, list[float]] = defaultdict(list)
-        self._second_windows: dict[str, list[float]] = defaultdict(list)
-        self._lock = asyncio.Lock()
+        # (capacity, window seconds, limit name) per bucket
+        self._buckets_spec: tuple[tuple[float, float, str], ...] = (
+            (float(self.config.burst_limit), 1.0, "burst"),
+            (float(self.config.requests_per_minute), 60.0, "minute"),
+            (float(self.config.requests_per_hour), 3600.0, "hour"),
+        )
+        # key -> [second_tokens, minute_tokens, hour_tokens, last_refill]
+        self._buckets: dict[str, list[float]] = {}
+
+    async def is_allowed(self, key: str) -> tuple[bool, dict]:
+        """
+        Check if request is allowed for the given key.
+        Returns (allowed, info) tuple.
+        """
+        # No lock needed: nothing below awaits, so the event loop runs the
+        # whole check-and-record step for a key without interleaving.
+        now = time.monotonic()
+        spec = self._buckets_spec
+
+        state = self._buckets.get(key)
+        if state is None:
+            state = [spec[0][0], spec[1][0], spec[2][0], now]
+            self._buckets[key] = state
+        else:
+            # Refill every bucket for the time elapsed since the last request
+            elapsed = now - state[3]
+            state[3] = now
+            for i, (capacity, window, _) in enumerate(spec):
+                state[i] = min(capacity, state[i] + elapsed * capacity / window)
+
+        info = {
+            "second": f"{round(spec[0][0] - state[0])}/{self.config.burst_limit}",
+            "minute": f"{round(spec[1][0] - state[1])}/{self.config.requests_per_minute}",
+            "hour": f"{round(spec[2][0] - state[2])}/{self.config.requests_per_hour}",
+        }
+
+        # Check burst, per-minute and per-hour limits in order
+        for i, (capacity, window, limit) in enumerate(spec):
+            if state[i] < 1:
+                retry_after = max(1, math.ceil((1 - state[i]) * window / capacity))
+                return False, {**info, "retry_after": retry_after, "limit": limit}
+
+        # Record request
+        state[0] -= 1
+        state[1] -= 1
+        state[2] -= 1
+
+        return True, info
+
+    def purge_idle(self) -> int:
+        """
+        Drop keys idle for longer than the longest window.
+        Their buckets are full again, so forgetting them changes nothing.
+        Returns the number of keys removed.
+        """
+        cutoff = time.monotonic() - self._buckets_spec[-1][1]
+        idle = [key for key, state in self._buckets.items() if state[3] <= cutoff]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+    async def aclose(self) -> None:
+        """Nothing to release; mirrors RedisRateLimiter.aclose()."""
 
-    def _clean_old_entries(self, window: list[float], max_age: float) -> list[float]:
-        """Remove entries older than max_age seconds."""
-        now = time.time()
-        return [t for t in window if now - t < max_age]
+
+# Checks all three windows and records the request in a single round-trip.
+# KEYS: second/minute/hour counter keys
+# ARGV[1..3]: limits, ARGV[4..6]: key TTLs in seconds
+_REDIS_RATE_LIMIT_SCRIPT = """
+local counts = {}
+for i = 1, 3 do
+    counts[i] = tonumber(redis.call('GET', KEYS[i]) or '0')
+end
+for i = 1, 3 do
+    if counts[i] >= tonumber(ARGV[i]) then
+        return {counts[1], counts[2], counts[3], i, redis.call('TTL', KEYS[i])}
+    end
+end
+for i = 1, 3 do
+    if redis.call('INCR', KEYS[i]) == 1 then
+        redis.call('EXPIRE', KEYS[i], ARGV[i + 3])
+    end
+end
+return {counts[1], counts[2], counts[3], 0, 0}
+"""
+
+
+class RedisRateLimiter:
+    """
+    Redis-backed rate limiter using fixed-window counters.
+    State is shared by every worker process, so limits hold with
+    `uvicorn --workers N`. Falls back to in-memory limiting if Redis
+    is unreachable.
+    """
+
+    LIMIT_NAMES = ("burst", "minute", "hour")
+    # Every request waits on Redis, so an unreachable server must fail fast
+    SOCKET_TIMEOUT = 0.25
+    # After a failure, skip Redis for this many seconds instead of retrying
+    # (and logging) on every request
+    RETRY_AFTER = 30.0
+
+    def __init__(self, redis_url: str, config: RateLimitConfig | None = None):
+        import redis.asyncio as redis
+
+        self.config = config or RateLimitConfig()
+        self._redis = redis.from_url(
+            redis_url,
+            socket_connect_timeout=self.SOCKET_TIMEOUT,
+            socket_timeout=self.SOCKET_TIMEOUT,
+        )
+        self._script = self._redis.register_script(_REDIS_RATE_LIMIT_SCRIPT)
+        self._fallback = RateLimiter(self.config)
+        # time.monotonic() until which requests go straight to the fallback
+        self._redis_down_until = 0.0
 
     async def is_allowed(self, key: str) -> tuple[bool, dict]:
         """
         Check if request is allowed for the given key.
         Returns (allowed, info) tuple.
         """
-        async with self._lock:
-            now = time.time()
+        if time.monotonic() < self._redis_down_until:
+            return await self._fallback.is_allowed(key)
 
-            # Clean old entries
-            self._second_windows[key] = self._clean_old_entries(
-                self._second_windows[key], 1
-            )
-            self._minute_windows[key] = self._clean_old_entries(
-                self._minute_windows[key], 60
+        # Wall-clock on purpose: bucket keys must agree across processes
+        now = int(time.time())
+        keys = [
+            f"rl:{key}:s:{now}",
+            f"rl:{key}:m:{now // 60}",
+            f"rl:{key}:h:{now // 3600}",
+        ]
+        args = [
+            self.config.burst_limit,
+            self.config.requests_per_minute,
+            self.config.requests_per_hour,
+            1,
+            60,
+            3600,
+        ]
+
+        try:
+            second_count, minute_count, hour_count, exceeded, ttl = await self._script(
+                keys=keys, args=args
             )
-            self._hour_windows[key] = self._clean_old_entries(
-                self._hour_windows[key], 3600
+        except Exception as e:
+            self._redis_down_until = time.monotonic() + self.RETRY_AFTER
+            logger.warning(
+                "Redis rate limit check failed, using in-memory for %ss: %s",
+                self.RETRY_AFTER,
+                e,
             )
+            return await self._fallback.is_allowed(key)
 
-            # Check limits
-            second_count = len(self._second_windows[key])
-            minute_count = len(self._minute_windows[key])
-            hour_count = len(self._hour_windows[key])
+        info = {
+            "second": f"{second_count}/{self.config.burst_limit}",
+            "minute": f"{minute_count}/{self.config.requests_per_minute}",
+            "hour": f"{hour_count}/{self.config.requests_per_hour}",
+        }
 
-            info = {
-                "second": f"{second_count}/{self.config.burst_limit}",
-                "minute": f"{minute_count}/{self.config.requests_per_minute}",
-                "hour": f"{hour_count}/{self.config.requests_per_hour}",
+        if exceeded:
+            return False, {
+                **info,
+                "retry_after": max(1, ttl),
+                "limit": self.LIMIT_NAMES[exceeded - 1],
             }
 
-            # Check burst limit
-            if second_count >= self.config.burst_limit:
-                return False, {**info, "retry_after": 1, "limit": "burst"}
+        return True, info
 
-            # Check per-minute limit
-            if minute_count >= self.config.requests_per_minute:
-                oldest = min(self._minute_windows[key]) if self._minute_windows[key] else now
-                retry_after = max(1, int(60 - (now - oldest)))
-                return False, {**info, "retry_after": retry_after, "limit": "minute"}
+    def purge_idle(self) -> int:
+        """Drop idle keys from the in-memory fallback; Redis keys expire on their own."""
+        return self._fallback.purge_idle()
 
-            # Check per-hour limit
-            if hour_count >= self.config.requests_per_hour:
-                oldest = min(self._hour_windows[key]) if self._hour_windows[key] else now
-                retry_after = max(1, int(3600 - (now - oldest)))
-                return False, {**info, "retry_after": retry_after, "limit": "hour"}
+    async def aclose(self) -> None:
+        """Close the Redis connection pool."""
+        await self._redis.aclose()
 
-            # Record request
-            self._second_windows[key].append(now)
-            self._minute_windows[key].append(now)
-            self._hour_windows[key].append(now)
 
-            return True, info
+def create_rate_limiter() -> RateLimiter | RedisRateLimiter:
+    """Create the Redis-backed limiter if REDIS_URL is set, else in-memory."""
+    redis_url = get_settings().redis_url
+    if redis_url:
+        return RedisRateLimiter(redis_url)
+    return RateLimiter()
 
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
+rate_limiter = create_rate_limiter()
+
+
+async def purge_idle_keys_periodically(interval: float = 60.0) -> None:
+    """Background task that keeps the limiter's memory bounded."""
+    while True:
+        await asyncio.sleep(interval)
+        removed = rate_limiter.purge_idle()
+        if removed:
+            logger.debug(f"Purged {removed} idle rate limit keys")
+
+
+async def close_rate_limiter() -> None:
+    """Release the limiter's connections on shutdown."""
+    await rate_limiter.aclose()
 
 
 async def rate_limit_middleware(request: Request, call_next: Callable):
     """
     Rate limiting middleware.
-    Uses client IP as the key.
+    Uses client IP as the key. Expects log_request_middleware to have
+    stored the path and client IP on request.state.
     """
-    # Skip rate limiting for health checks
-    if request.url.path in ["/health", "/", "/docs", "/redoc", "/openapi.json"]:
+    path = request.state.path
+
+    # Skip rate limiting for health checks, docs and static files
+    if path in SKIP_PATHS:
+        return await call_next(request)
+    if path.startswith(SKIP_PREFIXES):
         return await call_next(request)
 
     # Get client IP
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = request.state.client_ip or "unknown"
     
     # Check rate limit
     allowed, info = await rate_limiter.is_allowed(client_ip)
 
     if not allowed:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             content={
                 "error": {
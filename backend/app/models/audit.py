@@ -4,22 +4,27 @@ Audit log model for tracking all actions.
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, ForeignKey, Text
+from sqlalchemy import String, DateTime, ForeignKey, Text, Index, func
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.database import Base
+from app.database import Base, uuid7
 
 
 class AuditLog(Base):
     """Audit log for tracking user actions."""
     
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        Index("ix_audit_logs_created_at_brin", "created_at", postgresql_using="brin"),
+    )
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
     )
     user_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True),
@@ -35,8 +40,7 @@ class AuditLog(Base):
     user_agent: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.utcnow,
-        index=True,
+        server_default=func.now(),
     )
     
     def __repr__(self) -> str:
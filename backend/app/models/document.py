@@ -6,11 +6,11 @@ from datetime import datetime, date
 from decimal import Decimal
 from enum import Enum
 
-from sqlalchemy import String, DateTime, Date, ForeignKey, Text, Numeric, Float
+from sqlalchemy import String, DateTime, Date, ForeignKey, Text, Numeric, Float, Index, func, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, uuid7
 
 
 class DocumentStatus(str, Enum):
@@ -31,16 +31,21 @@ class Document(Base):
     """Receipt/Invoice document model."""
     
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_user_sha256", "user_id", "image_sha256"),
+        Index("ix_documents_created_at_brin", "created_at", postgresql_using="brin"),
+    )
+    # Fetch server-generated timestamps with RETURNING on insert/update
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
     )
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("users.id", ondelete="CASCADE"),
-        index=True,
     )
     vendor_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True),
@@ -53,7 +58,6 @@ class Document(Base):
     status: Mapped[str] = mapped_column(
         String(20),
         default=DocumentStatus.DRAFT.value,
-        index=True,
     )
     doc_type: Mapped[str] = mapped_column(
         String(20),
@@ -93,17 +97,18 @@ class Document(Base):
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.utcnow,
+        server_default=func.now(),
     )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.utcnow,
-        onupdate=datetime.utcnow,
+        server_default=func.now(),
+        onupdate=func.now(),
     )
     
     # Relationships
-    user = relationship("User", back_populates="documents")
-    vendor = relationship("Vendor", back_populates="documents")
+    # Listings never need the owner; load it with an explicit join instead.
+    user = relationship("User", back_populates="documents", lazy="raise")
+    vendor = relationship("Vendor", back_populates="documents", lazy="selectin")
     ledger_entry = relationship(
         "LedgerEntry",
         back_populates="document",
@@ -111,5 +116,28 @@ class Document(Base):
         cascade="all, delete-orphan",
     )
     
+    @property
+    def vendor_name(self) -> str | None:
+        """Display name of the linked vendor, if any."""
+        return self.vendor.display_name if self.vendor else None
+    
     def __repr__(self) -> str:
         return f"<Document {self.id} - {self.status}>"
+
+
+# Document listing: newest first per user, optionally narrowed by status
+Index("ix_documents_user_created", Document.user_id, Document.created_at.desc())
+Index(
+    "ix_documents_user_status_created",
+    Document.user_id,
+    Document.status,
+    Document.created_at.desc(),
+)
+Index("ix_documents_status_created", Document.status, Document.created_at.desc())
+# Draft queue per user (list_drafts); a small fraction of all documents
+Index(
+    "ix_documents_user_drafts",
+    Document.user_id,
+    Document.created_at.desc(),
+    postgresql_where=text("status = 'draft'"),
+)
@@ -6,11 +6,11 @@ from datetime import datetime
 from decimal import Decimal
 from enum import Enum
 
-from sqlalchemy import String, DateTime, ForeignKey, Text, Numeric
+from sqlalchemy import String, DateTime, ForeignKey, Text, Numeric, Index, text, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, uuid7
 
 
 class EntryDirection(str, Enum):
@@ -23,11 +23,13 @@ class Category(Base):
     """Category for classifying transactions."""
     
     __tablename__ = "categories"
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
     )
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -44,13 +46,13 @@ class Category(Base):
     color: Mapped[str | None] = mapped_column(String(7), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.utcnow,
+        server_default=func.now(),
     )
     
     # Relationships
     user = relationship("User", back_populates="categories")
     parent = relationship("Category", remote_side=[id], backref="children")
-    ledger_entries = relationship("LedgerEntry", back_populates="category", lazy="dynamic")
+    ledger_entries = relationship("LedgerEntry", back_populates="category", passive_deletes=True)
     
     def __repr__(self) -> str:
         return f"<Category {self.name}>"
@@ -60,22 +62,42 @@ class LedgerEntry(Base):
     """Accounting ledger entry."""
     
     __tablename__ = "ledger_entries"
+    __table_args__ = (
+        # Also covers the per-user period totals (/reports/summary, /report)
+        Index(
+            "ix_ledger_entries_user_date",
+            "user_id",
+            "entry_date",
+            postgresql_include=["direction", "amount", "tax_amount"],
+        ),
+        Index("ix_ledger_entries_direction", "direction"),
+        Index("ix_ledger_entries_entry_date_brin", "entry_date", postgresql_using="brin"),
+        # Expense reports (by-vendor breakdown) only ever read expense rows;
+        # the included columns let the per-vendor totals skip the heap
+        Index(
+            "ix_ledger_entries_expense_user_date",
+            "user_id",
+            "entry_date",
+            postgresql_include=["vendor_id", "amount"],
+            postgresql_where=text("direction = 'expense'"),
+        ),
+    )
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
     )
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("users.id", ondelete="CASCADE"),
-        index=True,
     )
     vendor_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("vendors.id", ondelete="SET NULL"),
         nullable=True,
-        index=True,
     )
     document_id: Mapped[uuid.UUID | None] = mapped_column(
         UUID(as_uuid=True),
@@ -87,7 +109,6 @@ class LedgerEntry(Base):
         UUID(as_uuid=True),
         ForeignKey("categories.id", ondelete="SET NULL"),
         nullable=True,
-        index=True,
     )
     
     direction: Mapped[str] = mapped_column(
@@ -107,7 +128,7 @@ class LedgerEntry(Base):
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.utcnow,
+        server_default=func.now(),
     )
     
     # Relationships
@@ -116,5 +137,21 @@ class LedgerEntry(Base):
     document = relationship("Document", back_populates="ledger_entry")
     category = relationship("Category", back_populates="ledger_entries")
     
+    @property
+    def vendor_name(self) -> str | None:
+        """Display name of the linked vendor, if any."""
+        return self.vendor.display_name if self.vendor else None
+    
+    @property
+    def category_name(self) -> str | None:
+        """Name of the linked category, if any."""
+        return self.category.name if self.category else None
+    
     def __repr__(self) -> str:
         return f"<LedgerEntry {self.direction} {self.amount}>"
+
+
+# Per-vendor / per-category listings, newest first; the leading column
+# also serves the ON DELETE SET NULL lookups
+Index("ix_ledger_entries_vendor_date", LedgerEntry.vendor_id, LedgerEntry.entry_date.desc())
+Index("ix_ledger_entries_category_date", LedgerEntry.category_id, LedgerEntry.entry_date.desc())
@@ -4,22 +4,24 @@ User model.
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, DateTime
+from sqlalchemy import String, DateTime, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, uuid7
 
 
 class User(Base):
     """User account model."""
     
     __tablename__ = "users"
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
     )
     telegram_id: Mapped[str | None] = mapped_column(
         String(50),
@@ -38,14 +40,14 @@ class User(Base):
     is_active: Mapped[bool] = mapped_column(default=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.utcnow,
+        server_default=func.now(),
     )
     
     # Relationships
-    vendors = relationship("Vendor", back_populates="user", lazy="dynamic")
-    documents = relationship("Document", back_populates="user", lazy="dynamic")
-    ledger_entries = relationship("LedgerEntry", back_populates="user", lazy="dynamic")
-    categories = relationship("Category", back_populates="user", lazy="dynamic")
+    vendors = relationship("Vendor", back_populates="user", passive_deletes=True)
+    documents = relationship("Document", back_populates="user", passive_deletes=True)
+    ledger_entries = relationship("LedgerEntry", back_populates="user", passive_deletes=True)
+    categories = relationship("Category", back_populates="user", passive_deletes=True)
     
     def __repr__(self) -> str:
         return f"<User {self.name}>"
@@ -4,27 +4,56 @@ Vendor (Cari) model with alias support.
 import uuid
 from datetime import datetime
 
-from sqlalchemy import String, DateTime, ForeignKey, Text
+from sqlalchemy import String, DateTime, ForeignKey, Text, Index, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, uuid7
 
 
 class Vendor(Base):
     """Vendor/Cari model for storing merchant information."""
     
     __tablename__ = "vendors"
+    __table_args__ = (
+        # A VKN identifies one vendor per user; also the conflict target for
+        # create_vendor's INSERT ... ON CONFLICT
+        UniqueConstraint("user_id", "vkn", name="uq_vendors_user_vkn"),
+        # Per-user vendor list, walked in display_name order
+        Index("ix_vendors_user_display_name", "user_id", "display_name"),
+        # Substring/fuzzy search on normalized names (needs pg_trgm)
+        Index(
+            "ix_vendors_normalized_name_trgm",
+            "normalized_name",
+            postgresql_using="gin",
+            postgresql_ops={"normalized_name": "gin_trgm_ops"},
+        ),
+        # Case-insensitive substring search (ILIKE) in the vendor list and
+        # autocomplete
+        Index(
+            "ix_vendors_display_name_trgm",
+            "display_name",
+            postgresql_using="gin",
+            postgresql_ops={"display_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_vendors_vkn_trgm",
+            "vkn",
+            postgresql_using="gin",
+            postgresql_ops={"vkn": "gin_trgm_ops"},
+        ),
+    )
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
     )
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         ForeignKey("users.id", ondelete="CASCADE"),
-        index=True,
     )
     display_name: Mapped[str] = mapped_column(String(255))
     normalized_name: Mapped[str] = mapped_column(String(255), index=True)
@@ -45,19 +74,21 @@ class Vendor(Base):
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.utcnow,
+        server_default=func.now(),
     )
     
     # Relationships
     user = relationship("User", back_populates="vendors")
+    # Only the vendor endpoints and the matcher need aliases; they ask for
+    # them with selectinload() instead of every vendor load fetching them
     aliases = relationship(
         "VendorAlias",
         back_populates="vendor",
         cascade="all, delete-orphan",
-        lazy="joined",
+        lazy="raise",
     )
-    documents = relationship("Document", back_populates="vendor", lazy="dynamic")
-    ledger_entries = relationship("LedgerEntry", back_populates="vendor", lazy="dynamic")
+    documents = relationship("Document", back_populates="vendor", passive_deletes=True)
+    ledger_entries = relationship("LedgerEntry", back_populates="vendor", passive_deletes=True)
     
     def __repr__(self) -> str:
         return f"<Vendor {self.display_name}>"
@@ -67,11 +98,21 @@ class VendorAlias(Base):
     """Alternative names/variations for a vendor."""
     
     __tablename__ = "vendor_aliases"
+    __table_args__ = (
+        Index(
+            "ix_vendor_aliases_normalized_alias_trgm",
+            "normalized_alias",
+            postgresql_using="gin",
+            postgresql_ops={"normalized_alias": "gin_trgm_ops"},
+        ),
+    )
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
     )
     vendor_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -82,7 +123,7 @@ class VendorAlias(Base):
     normalized_alias: Mapped[str] = mapped_column(String(255), index=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.utcnow,
+        server_default=func.now(),
     )
     
     # Relationships
@@ -0,0 +1,19 @@
+"""
+Response classes shared across the application.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def prebuilt_json(content: Any) -> bytes:
+    """Serialize a constant response body once, at import time."""
+    return orjson.dumps(content)
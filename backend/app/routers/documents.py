@@ -1,27 +1,70 @@
 """
 Document endpoints - upload, OCR, draft/confirm flow.
 """
+import asyncio
 import hashlib
+import logging
 import uuid
-from datetime import datetime
 from pathlib import Path
 
+import aiofiles
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.auth import get_current_user_id
 from app.config import get_settings
-from app.database import get_db
+from app.database import get_db, uuid7
 from app.models.document import Document, DocumentStatus
+from app.models.user import User
+from app.models.vendor import Vendor
 from app.schemas.document import (
     DocumentResponse,
     DocumentUpdate,
     DocumentConfirm,
     DocumentDraft,
 )
+from app.services.ocr_service import get_ocr_service
+from app.services.extraction_service import get_extraction_service
+from app.services.vendor_matcher import get_vendor_matcher
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Listings select only what DocumentResponse serializes (no OCR text or
+# extraction JSON) and return plain rows instead of ORM objects
+DOCUMENT_LIST_COLUMNS = (
+    Document.id,
+    Document.user_id,
+    Document.vendor_id,
+    Document.status,
+    Document.doc_type,
+    Document.doc_date,
+    Document.doc_no,
+    Document.currency,
+    Document.total_gross,
+    Document.total_tax,
+    Document.total_net,
+    Document.notes,
+    Document.image_url,
+    Document.confidence_score,
+    Document.created_at,
+    Document.updated_at,
+    Vendor.display_name.label("vendor_name"),
+)
+
+
+def _document_list_query(user_id: uuid.UUID):
+    """Projection used by the document listings, newest first."""
+    return (
+        select(*DOCUMENT_LIST_COLUMNS)
+        .outerjoin(Vendor, Document.vendor_id == Vendor.id)
+        .where(Document.user_id == user_id)
+        .order_by(Document.created_at.desc())
+    )
 
 
 @router.get("/", response_model=list[DocumentResponse])
@@ -30,44 +73,43 @@ async def list_documents(
     limit: int = 50,
     offset: int = 0,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """List all documents with optional filtering."""
-    query = select(Document).order_by(Document.created_at.desc())
+    query = _document_list_query(user_id)
     
     if status_filter:
         query = query.where(Document.status == status_filter)
     
     query = query.limit(limit).offset(offset)
     result = await db.execute(query)
-    documents = result.scalars().all()
     
-    return documents
+    return result.all()
 
 
 @router.get("/drafts", response_model=list[DocumentResponse])
-async def list_drafts(db: AsyncSession = Depends(get_db)):
+async def list_drafts(
+    db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
+):
     """List all draft documents awaiting confirmation."""
-    query = (
-        select(Document)
-        .where(Document.status == DocumentStatus.DRAFT.value)
-        .order_by(Document.created_at.desc())
+    query = _document_list_query(user_id).where(
+        Document.status == DocumentStatus.DRAFT.value
     )
     result = await db.execute(query)
-    return result.scalars().all()
+    return result.all()
 
 
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Get a specific document by ID."""
-    result = await db.execute(
-        select(Document).where(Document.id == document_id)
-    )
-    document = result.scalar_one_or_none()
+    document = await db.get(Document, document_id)
     
-    if not document:
+    if not document or document.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found",
@@ -76,148 +118,308 @@ async def get_document(
     return document
 
 
+ALLOWED_UPLOAD_TYPES = frozenset({"image/jpeg", "image/png", "image/webp", "application/pdf"})
+MAX_BATCH_FILES = 20
+
+
+def _draft_from_document(document: Document) -> DocumentDraft:
+    """Rebuild the upload draft for an already processed document."""
+    extraction = document.extraction_json or {}
+    return DocumentDraft(
+        vendor_name=document.vendor_name or extraction.get("vendor_name"),
+        suggested_vendor_id=document.vendor_id,
+        doc_date=document.doc_date,
+        total_gross=document.total_gross,
+        total_tax=document.total_tax,
+        currency=document.currency,
+        raw_ocr_text=document.raw_ocr_text[:500] if document.raw_ocr_text else None,
+        confidence_score=extraction.get("confidence"),
+        extraction_details={
+            "document_id": str(document.id),
+            "ocr_confidence": document.confidence_score,
+            "is_duplicate": True,
+        },
+    )
+
+
+def _check_upload_type(file: UploadFile) -> None:
+    """Reject uploads whose content type is not an accepted image/PDF type."""
+    if file.content_type not in ALLOWED_UPLOAD_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type not allowed. Allowed: {sorted(ALLOWED_UPLOAD_TYPES)}",
+        )
+
+
+async def _save_upload(file: UploadFile) -> tuple[Path, str]:
+    """
+    Store an uploaded file (already type-checked) under its SHA-256 name.
+    
+    Returns:
+        (file_path, file_hash)
+    """
+    upload_dir = Path(settings.upload_dir)
+    try:
+        upload_dir.mkdir(parents=True, exist_ok=True)
+    except Exception:
+        # Fallback to /tmp if permissions fail
+        upload_dir = Path("/tmp/uploads")
+        upload_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Stream to disk in 1 MiB chunks, hashing and enforcing the size
+    # limit on the way so the whole upload never sits in memory
+    hasher = hashlib.sha256()
+    size = 0
+    tmp_path = upload_dir / f".{uuid.uuid4().hex}.part"
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.max_upload_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"File too large. Max size: {settings.max_upload_size / 1024 / 1024}MB",
+                    )
+                hasher.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    file_hash = hasher.hexdigest()
+    file_ext = Path(file.filename or "image.jpg").suffix
+    file_path = upload_dir / f"{file_hash}{file_ext}"
+    
+    # Same content is already stored under this name
+    if file_path.exists():
+        tmp_path.unlink(missing_ok=True)
+    else:
+        tmp_path.replace(file_path)
+    
+    return file_path, file_hash
+
+
+async def _find_duplicates(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    file_hashes: list[str],
+) -> dict[str, Document]:
+    """Map file hashes to live documents already created from the same bytes."""
+    result = await db.execute(
+        select(Document).where(
+            Document.user_id == user_id,
+            Document.image_sha256.in_(file_hashes),
+            Document.status != DocumentStatus.CANCELLED.value,
+        )
+    )
+    return {document.image_sha256: document for document in result.scalars()}
+
+
+async def _ensure_default_user(db: AsyncSession, user_id: uuid.UUID) -> None:
+    """Create the default user if seed data is missing."""
+    user_check = await db.execute(select(User.id).where(User.id == user_id))
+    if not user_check.scalar_one_or_none():
+        logger.info("Creating default user %s", user_id)
+        default_user = User(
+            id=user_id,
+            name="Default User",
+            email="default@example.com",
+            is_active=True
+        )
+        db.add(default_user)
+        await db.commit()  # Commit user first
+
+
+def _create_draft(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    file_path: Path,
+    file_hash: str,
+    ocr_result: dict,
+    extraction,
+    vendor_match,
+) -> tuple[Document, DocumentDraft]:
+    """Add a draft document for a processed upload and build its response."""
+    raw_text = ocr_result.get('text', '')
+    ocr_confidence = ocr_result.get('confidence', 0)
+    
+    document = Document(
+        id=uuid7(),
+        user_id=user_id,
+        vendor_id=vendor_match.vendor_id if not vendor_match.is_new else None,
+        status=DocumentStatus.DRAFT.value,
+        doc_date=extraction.doc_date,
+        doc_no=extraction.doc_no,
+        currency=extraction.currency,
+        total_gross=extraction.total_gross,
+        total_tax=extraction.total_tax,
+        total_net=extraction.total_net,
+        raw_ocr_text=raw_text,
+        extraction_json=extraction.to_dict(),
+        confidence_score=ocr_confidence,
+        image_url=str(file_path),
+        image_sha256=file_hash,
+    )
+    db.add(document)
+    
+    draft = DocumentDraft(
+        vendor_name=extraction.vendor_name,
+        vendor_confidence=vendor_match.confidence if not vendor_match.is_new else None,
+        suggested_vendor_id=vendor_match.vendor_id,
+        doc_date=extraction.doc_date,
+        total_gross=extraction.total_gross,
+        total_tax=extraction.total_tax,
+        currency=extraction.currency,
+        raw_ocr_text=raw_text[:500] if raw_text else None,
+        confidence_score=extraction.confidence,
+        extraction_details={
+            "document_id": str(document.id),
+            "ocr_confidence": ocr_confidence,
+            "vendor_match_type": vendor_match.match_type,
+            "is_new_vendor": vendor_match.is_new,
+        },
+    )
+    return document, draft
+
+
 @router.post("/upload", response_model=DocumentDraft)
 async def upload_document(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """
     Upload a receipt/invoice image for OCR processing.
     Returns a draft with extracted fields for confirmation.
     """
-    # Imports inside function to avoid circular imports
-    from app.services.ocr_service import get_ocr_service
-    from app.services.extraction_service import get_extraction_service
-    from app.services.vendor_matcher import get_vendor_matcher
-    import traceback
-
     try:
-        # Validate file type
-        allowed_types = ["image/jpeg", "image/png", "image/webp", "application/pdf"]
-        if file.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File type not allowed. Allowed: {allowed_types}",
-            )
+        _check_upload_type(file)
+        file_path, file_hash = await _save_upload(file)
         
-        # Check file size
-        content = await file.read()
-        if len(content) > settings.max_upload_size:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File too large. Max size: {settings.max_upload_size / 1024 / 1024}MB",
-            )
-        
-        # Calculate hash
-        file_hash = hashlib.sha256(content).hexdigest()
-        
-        # Save file locally
-        upload_dir = Path(settings.upload_dir)
-        try:
-            upload_dir.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            # Fallback to /tmp if permissions fail
-            upload_dir = Path("/tmp/uploads")
-            upload_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_ext = Path(file.filename or "image.jpg").suffix
-        file_path = upload_dir / f"{file_hash}{file_ext}"
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
+        # A byte-identical upload already has a draft - skip OCR entirely
+        duplicates = await _find_duplicates(db, user_id, [file_hash])
+        if file_hash in duplicates:
+            return _draft_from_document(duplicates[file_hash])
         
         # OCR Processing
         ocr_service = get_ocr_service()
         extraction_service = get_extraction_service()
         vendor_matcher = get_vendor_matcher()
         
-        # Extract text from image
-        ocr_result = ocr_service.extract_text(str(file_path))
+        # Extract text from image; the user check's round trip overlaps it
+        ocr_result, _ = await asyncio.gather(
+            ocr_service.extract_text_async(str(file_path)),
+            _ensure_default_user(db, user_id),
+        )
         raw_text = ocr_result.get('text', '')
-        # Log debug info
-        print(f"OCR Result: {ocr_result}")
+        logger.debug("OCR result for %s: %s", file_hash, ocr_result)
         
         # Extract structured fields
         extraction = extraction_service.extract(raw_text)
         
         # Try to match vendor
-        # Fix: Ensure user_id is UUID and exists in DB
-        user_id = uuid.UUID("00000000-0000-0000-0000-000000000001") 
-        
-        # Check if user exists, create if not (Self-healing for missing seed data)
-        from app.models.user import User
-        user_check = await db.execute(select(User).where(User.id == user_id))
-        if not user_check.scalar_one_or_none():
-            print(f"Creating default user {user_id}")
-            default_user = User(
-                id=user_id,
-                name="Default User",
-                email="default@example.com",
-                is_active=True
-            )
-            db.add(default_user)
-            await db.commit()  # Commit user first
-        
         vendor_match = await vendor_matcher.find_match(
             db,
             user_id,
-            vendor_name=extraction.vendor_name,
-            vkn=extraction.vendor_vkn,
-            tckn=extraction.vendor_tckn,
+            extraction.vendor_name,
+            extraction.vendor_vkn,
+            extraction.vendor_tckn,
         )
         
         # Create document record
-        document = Document(
-            user_id=user_id,
-            vendor_id=vendor_match.vendor_id if not vendor_match.is_new else None,
-            status=DocumentStatus.DRAFT.value,
-            doc_date=extraction.doc_date,
-            doc_no=extraction.doc_no,
-            currency=extraction.currency,
-            total_gross=extraction.total_gross,
-            total_tax=extraction.total_tax,
-            total_net=extraction.total_net,
-            raw_ocr_text=raw_text,
-            extraction_json=extraction.to_dict(),
-            confidence_score=ocr_result.get('confidence', 0),
-            image_url=str(file_path),
-            image_sha256=file_hash,
+        _, draft = _create_draft(
+            db, user_id, file_path, file_hash, ocr_result, extraction, vendor_match
         )
-        db.add(document)
         await db.commit()
-        await db.refresh(document)
-        
-        ocr_confidence = ocr_result.get('confidence', 0)
         
-        return DocumentDraft(
-            vendor_name=extraction.vendor_name,
-            vendor_confidence=vendor_match.confidence if not vendor_match.is_new else None,
-            suggested_vendor_id=vendor_match.vendor_id,
-            doc_date=extraction.doc_date,
-            total_gross=extraction.total_gross,
-            total_tax=extraction.total_tax,
-            currency=extraction.currency,
-            raw_ocr_text=raw_text[:500] if raw_text else None,
-            confidence_score=extraction.confidence,
-            extraction_details={
-                "document_id": str(document.id),
-                "ocr_confidence": ocr_confidence,
-                "vendor_match_type": vendor_match.match_type,
-                "is_new_vendor": vendor_match.is_new,
-            },
-        )
+        return draft
 
     except HTTPException:
         raise
     except Exception as e:
-        error_trace = traceback.format_exc()
-        print(f"Upload Error: {error_trace}")
+        logger.exception("Upload failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Upload Error: {str(e)}",
         )
 
 
+@router.post("/batch-upload", response_model=list[DocumentDraft])
+async def batch_upload_documents(
+    files: list[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
+):
+    """
+    Upload several receipts at once (bulk import).
+    OCR runs concurrently (alongside the user check); vendors are matched
+    in one lookup for the whole batch (find_matches), the same way as
+    single uploads and the Telegram bot.
+    Drafts are returned in upload order.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many files. Max per batch: {MAX_BATCH_FILES}",
+        )
+    
+    try:
+        # Reject the whole batch before anything is written to disk
+        for file in files:
+            _check_upload_type(file)
+        
+        saved = [await _save_upload(file) for file in files]
+        duplicates = await _find_duplicates(db, user_id, [h for _, h in saved])
+        
+        # Only the first copy of each new file needs OCR
+        pending: dict[str, Path] = {}
+        for file_path, file_hash in saved:
+            if file_hash not in duplicates:
+                pending.setdefault(file_hash, file_path)
+        
+        ocr_service = get_ocr_service()
+        extraction_service = get_extraction_service()
+        vendor_matcher = get_vendor_matcher()
+        
+        ocr_results, _ = await asyncio.gather(
+            asyncio.gather(
+                *(ocr_service.extract_text_async(str(path)) for path in pending.values())
+            ),
+            _ensure_default_user(db, user_id),
+        )
+        extractions = [
+            extraction_service.extract(ocr_result.get('text', ''))
+            for ocr_result in ocr_results
+        ]
+        
+        vendor_matches = await vendor_matcher.find_matches(
+            db,
+            user_id,
+            [(e.vendor_name, e.vendor_vkn, e.vendor_tckn) for e in extractions],
+        )
+        
+        drafts: dict[str, DocumentDraft] = {}
+        for (file_hash, file_path), ocr_result, extraction, vendor_match in zip(
+            pending.items(), ocr_results, extractions, vendor_matches
+        ):
+            _, drafts[file_hash] = _create_draft(
+                db, user_id, file_path, file_hash, ocr_result, extraction, vendor_match
+            )
+        await db.commit()
+        
+        return [
+            drafts[file_hash] if file_hash in drafts else _draft_from_document(duplicates[file_hash])
+            for _, file_hash in saved
+        ]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Batch upload failed")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Upload Error: {str(e)}",
+        )
 
 
 @router.post("/{document_id}/confirm", response_model=DocumentResponse)
@@ -225,14 +427,12 @@ async def confirm_document(
     document_id: uuid.UUID,
     data: DocumentConfirm,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Confirm a draft document and create ledger entry."""
-    result = await db.execute(
-        select(Document).where(Document.id == document_id)
-    )
-    document = result.scalar_one_or_none()
+    document = await db.get(Document, document_id)
     
-    if not document:
+    if not document or document.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found",
@@ -245,17 +445,19 @@ async def confirm_document(
         )
     
     # Update document with confirmed values
+    vendor_changed = document.vendor_id != data.vendor_id
     document.vendor_id = data.vendor_id
     document.doc_date = data.doc_date
     document.total_gross = data.total_gross
     document.total_tax = data.total_tax
     document.status = DocumentStatus.POSTED.value
-    document.updated_at = datetime.utcnow()
     
     # TODO: Create ledger entry
     
+    # updated_at comes back via RETURNING; only the vendor may need loading
     await db.commit()
-    await db.refresh(document)
+    if vendor_changed:
+        await db.refresh(document, ["vendor"])
     
     return document
 
@@ -265,14 +467,12 @@ async def update_document(
     document_id: uuid.UUID,
     data: DocumentUpdate,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Update a document."""
-    result = await db.execute(
-        select(Document).where(Document.id == document_id)
-    )
-    document = result.scalar_one_or_none()
+    document = await db.get(Document, document_id)
     
-    if not document:
+    if not document or document.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found",
@@ -283,9 +483,9 @@ async def update_document(
     for field, value in update_data.items():
         setattr(document, field, value)
     
-    document.updated_at = datetime.utcnow()
     await db.commit()
-    await db.refresh(document)
+    if "vendor_id" in update_data:
+        await db.refresh(document, ["vendor"])
     
     return document
 
@@ -294,21 +494,18 @@ async def update_document(
 async def cancel_document(
     document_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Cancel a document (soft delete)."""
-    result = await db.execute(
-        select(Document).where(Document.id == document_id)
-    )
-    document = result.scalar_one_or_none()
+    document = await db.get(Document, document_id)
     
-    if not document:
+    if not document or document.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found",
         )
     
     document.status = DocumentStatus.CANCELLED.value
-    document.updated_at = datetime.utcnow()
     await db.commit()
     
     return {"message": "Document cancelled"}
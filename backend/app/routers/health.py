@@ -1,10 +1,19 @@
 """
 Health check endpoint.
 """
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+
 from fastapi import APIRouter
 
 router = APIRouter(tags=["Health"])
 
+OCR_PROBE_TTL = 60.0
+_ocr_probe: tuple[float, dict] | None = None
+
 
 @router.get("/health")
 async def health_check():
@@ -24,13 +33,13 @@ async def root():
         "docs": "/docs",
     }
 
-@router.get("/health/ocr")
-async def ocr_debug():
-    """Diagnostic endpoint for OCR system."""
-    import shutil
-    import os
-    import subprocess
-    
+def _run_probe(args: list[str]) -> subprocess.CompletedProcess:
+    """Run a short Tesseract command, capturing its output."""
+    return subprocess.run(args, capture_output=True, text=True, timeout=5)
+
+
+def _probe_tesseract() -> dict:
+    """Collect Tesseract diagnostics (blocking: spawns subprocesses)."""
     tesseract_path = shutil.which("tesseract")
     
     # Check common paths explicitly
@@ -41,30 +50,16 @@ async def ocr_debug():
     ]
     path_checks = {p: os.path.exists(p) for p in common_paths}
     
-    # Try running tesseract --version
     version_output = "Failed to run"
+    langs = "Unknown"
     if tesseract_path:
         try:
-            result = subprocess.run(
-                [tesseract_path, "--version"], 
-                capture_output=True, 
-                text=True, 
-                timeout=5
-            )
+            result = _run_probe([tesseract_path, "--version"])
             version_output = result.stdout + result.stderr
         except Exception as e:
             version_output = str(e)
-            
-    # Check languages
-    langs = "Unknown"
-    if tesseract_path:
         try:
-            result = subprocess.run(
-                [tesseract_path, "--list-langs"], 
-                capture_output=True, 
-                text=True, 
-                timeout=5
-            )
+            result = _run_probe([tesseract_path, "--list-langs"])
             langs = result.stdout
         except Exception as e:
             langs = str(e)
@@ -76,3 +71,16 @@ async def ocr_debug():
         "tesseract_version": version_output,
         "available_languages": langs,
     }
+
+
+@router.get("/health/ocr")
+async def ocr_debug():
+    """Diagnostic endpoint for OCR system."""
+    global _ocr_probe
+    
+    # The binary and its language packs don't change while the process runs,
+    # so repeated probes reuse one result instead of forking every call
+    now = time.monotonic()
+    if _ocr_probe is None or now - _ocr_probe[0] > OCR_PROBE_TTL:
+        _ocr_probe = (now, await asyncio.to_thread(_probe_tesseract))
+    return _ocr_probe[1]
@@ -5,11 +5,14 @@ import uuid
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
+from app.auth import get_current_user_id
 from app.database import get_db
 from app.models.ledger import LedgerEntry, Category
+from app.models.vendor import Vendor
 from app.schemas.ledger import (
     LedgerEntryCreate,
     LedgerEntryUpdate,
@@ -20,6 +23,40 @@ from app.schemas.ledger import (
 
 router = APIRouter(prefix="/ledger", tags=["Ledger"])
 
+# Listings select only the response columns (names joined in) and return
+# plain rows instead of ORM objects
+ENTRY_LIST_COLUMNS = (
+    LedgerEntry.id,
+    LedgerEntry.user_id,
+    LedgerEntry.vendor_id,
+    LedgerEntry.document_id,
+    LedgerEntry.category_id,
+    LedgerEntry.direction,
+    LedgerEntry.amount,
+    LedgerEntry.tax_amount,
+    LedgerEntry.currency,
+    LedgerEntry.notes,
+    LedgerEntry.entry_date,
+    LedgerEntry.created_at,
+    Vendor.display_name.label("vendor_name"),
+    Category.name.label("category_name"),
+)
+
+# LedgerEntryResponse reads vendor_name / category_name off these
+ENTRY_NAME_LOADS = (
+    selectinload(LedgerEntry.vendor),
+    selectinload(LedgerEntry.category),
+)
+
+CATEGORY_LIST_COLUMNS = (
+    Category.id,
+    Category.name,
+    Category.icon,
+    Category.color,
+    Category.parent_id,
+    Category.created_at,
+)
+
 
 # ============ Ledger Entries ============
 
@@ -31,9 +68,16 @@ async def list_entries(
     limit: int = 50,
     offset: int = 0,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """List ledger entries with optional filtering."""
-    query = select(LedgerEntry).order_by(LedgerEntry.entry_date.desc())
+    query = (
+        select(*ENTRY_LIST_COLUMNS)
+        .outerjoin(Vendor, LedgerEntry.vendor_id == Vendor.id)
+        .outerjoin(Category, LedgerEntry.category_id == Category.id)
+        .where(LedgerEntry.user_id == user_id)
+        .order_by(LedgerEntry.entry_date.desc())
+    )
     
     if direction:
         query = query.where(LedgerEntry.direction == direction)
@@ -45,21 +89,23 @@ async def list_entries(
     query = query.limit(limit).offset(offset)
     result = await db.execute(query)
     
-    return result.scalars().all()
+    return result.all()
 
 
 @router.get("/entries/{entry_id}", response_model=LedgerEntryResponse)
 async def get_entry(
     entry_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Get a specific ledger entry."""
-    result = await db.execute(
-        select(LedgerEntry).where(LedgerEntry.id == entry_id)
+    entry = await db.scalar(
+        select(LedgerEntry)
+        .where(LedgerEntry.id == entry_id)
+        .options(*ENTRY_NAME_LOADS)
     )
-    entry = result.scalar_one_or_none()
     
-    if not entry:
+    if not entry or entry.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ledger entry not found",
@@ -72,10 +118,11 @@ async def get_entry(
 async def create_entry(
     data: LedgerEntryCreate,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Create a manual ledger entry."""
-    entry = LedgerEntry(
-        user_id=uuid.UUID("00000000-0000-0000-0000-000000000001"),  # TODO: get from auth
+    stmt = insert(LedgerEntry).values(
+        user_id=user_id,
         vendor_id=data.vendor_id,
         document_id=data.document_id,
         category_id=data.category_id,
@@ -85,10 +132,9 @@ async def create_entry(
         currency=data.currency,
         notes=data.notes,
         entry_date=data.entry_date or datetime.utcnow(),
-    )
-    db.add(entry)
+    ).returning(LedgerEntry).options(*ENTRY_NAME_LOADS)
+    entry = await db.scalar(stmt)
     await db.commit()
-    await db.refresh(entry)
     
     return entry
 
@@ -98,14 +144,16 @@ async def update_entry(
     entry_id: uuid.UUID,
     data: LedgerEntryUpdate,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Update a ledger entry."""
-    result = await db.execute(
-        select(LedgerEntry).where(LedgerEntry.id == entry_id)
+    entry = await db.scalar(
+        select(LedgerEntry)
+        .where(LedgerEntry.id == entry_id)
+        .options(*ENTRY_NAME_LOADS)
     )
-    entry = result.scalar_one_or_none()
     
-    if not entry:
+    if not entry or entry.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ledger entry not found",
@@ -119,7 +167,13 @@ async def update_entry(
         setattr(entry, field, value)
     
     await db.commit()
-    await db.refresh(entry)
+    # Only the name lookups can go stale; columns are already current
+    stale = [
+        rel for rel, fk in (("vendor", "vendor_id"), ("category", "category_id"))
+        if fk in update_data
+    ]
+    if stale:
+        await db.refresh(entry, stale)
     
     return entry
 
@@ -128,14 +182,12 @@ async def update_entry(
 async def delete_entry(
     entry_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Delete a ledger entry."""
-    result = await db.execute(
-        select(LedgerEntry).where(LedgerEntry.id == entry_id)
-    )
-    entry = result.scalar_one_or_none()
+    entry = await db.get(LedgerEntry, entry_id)
     
-    if not entry:
+    if not entry or entry.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ledger entry not found",
@@ -150,30 +202,35 @@ async def delete_entry(
 # ============ Categories ============
 
 @router.get("/categories", response_model=list[CategoryResponse])
-async def list_categories(db: AsyncSession = Depends(get_db)):
+async def list_categories(
+    db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
+):
     """List all categories."""
     result = await db.execute(
-        select(Category).order_by(Category.name)
+        select(*CATEGORY_LIST_COLUMNS)
+        .where(Category.user_id == user_id)
+        .order_by(Category.name)
     )
-    return result.scalars().all()
+    return result.all()
 
 
 @router.post("/categories", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
 async def create_category(
     data: CategoryCreate,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Create a new category."""
-    category = Category(
-        user_id=uuid.UUID("00000000-0000-0000-0000-000000000001"),  # TODO: get from auth
+    stmt = insert(Category).values(
+        user_id=user_id,
         name=data.name,
         icon=data.icon,
         color=data.color,
         parent_id=data.parent_id,
-    )
-    db.add(category)
+    ).returning(Category)
+    category = await db.scalar(stmt)
     await db.commit()
-    await db.refresh(category)
     
     return category
 
@@ -183,14 +240,12 @@ async def update_category(
     category_id: uuid.UUID,
     data: CategoryCreate,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Update a category."""
-    result = await db.execute(
-        select(Category).where(Category.id == category_id)
-    )
-    category = result.scalar_one_or_none()
+    category = await db.get(Category, category_id)
     
-    if not category:
+    if not category or category.user_id != user_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found",
@@ -202,6 +257,5 @@ async def update_category(
     category.parent_id = data.parent_id
     
     await db.commit()
-    await db.refresh(category)
     
     return category
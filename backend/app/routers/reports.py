@@ -1,18 +1,26 @@
 """
 Reports and export endpoints.
 """
+import asyncio
+import csv
+import hashlib
 import io
+import tempfile
 import uuid
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select, func
+from sqlalchemy import Float, case, cast, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
+import orjson
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 
+from app.auth import get_current_user_id
 from app.database import get_db
 from app.models.ledger import LedgerEntry, EntryDirection
 from app.models.vendor import Vendor
@@ -21,42 +29,92 @@ from app.schemas.ledger import ReportSummary
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
+EXPORT_CHUNK_SIZE = 64 * 1024
+XLSX_SPOOL_SIZE = 4 * 1024 * 1024
+
+# Export labels for LedgerEntry.direction
+DIRECTION_LABELS = {
+    EntryDirection.EXPENSE.value: "Gider",
+    EntryDirection.INCOME.value: "Gelir",
+}
+
+
+def _conditional_json(request: Request, body: bytes) -> Response:
+    """
+    Return a JSON body with an ETag, or 304 if the client already has it.
+    
+    Dashboards and the bot poll the report endpoints; unchanged results then
+    cost a status line instead of the full body.
+    """
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _end_of_hour(moment: datetime) -> datetime:
+    """
+    Round a moment up to the next full hour.
+    
+    Every request within the same hour then sends identical query
+    parameters and gets a body with the same ETag.
+    """
+    return datetime(moment.year, moment.month, moment.day, moment.hour) + timedelta(hours=1)
+
+
+def _period_bounds(period: str) -> tuple[datetime, datetime]:
+    """Start and end of a week/month/year period ending now (rounded up to the hour)."""
+    now = datetime.utcnow()
+    period_end = _end_of_hour(now)
+    
+    if period == "week":
+        period_start = period_end - timedelta(days=7)
+    elif period == "month":
+        period_start = datetime(now.year, now.month, 1)
+    else:
+        period_start = datetime(now.year, 1, 1)
+    
+    return period_start, period_end
+
 
 @router.get("/summary", response_model=ReportSummary)
 async def get_summary(
+    request: Request,
     period: str = Query("month", regex="^(week|month|year|custom)$"),
     start_date: datetime | None = None,
     end_date: datetime | None = None,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Get summary statistics for a period."""
-    now = datetime.utcnow()
-    
-    # Calculate period dates
-    if period == "week":
-        period_start = now - timedelta(days=7)
-        period_end = now
-    elif period == "month":
-        period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        period_end = now
-    elif period == "year":
-        period_start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        period_end = now
-    else:  # custom
-        period_start = start_date or now - timedelta(days=30)
-        period_end = end_date or now
+    if period == "custom":
+        period_end = end_date or _end_of_hour(datetime.utcnow())
+        period_start = start_date or period_end - timedelta(days=30)
+    else:
+        period_start, period_end = _period_bounds(period)
     
     # Get totals
+    # Conditional sums keep this to one aggregation pass; count(*) lets the
+    # planner answer it from ix_ledger_entries_user_date alone
     query = select(
-        func.sum(LedgerEntry.amount).filter(
-            LedgerEntry.direction == EntryDirection.INCOME.value
-        ).label("income"),
-        func.sum(LedgerEntry.amount).filter(
-            LedgerEntry.direction == EntryDirection.EXPENSE.value
-        ).label("expense"),
+        func.sum(case(
+            (LedgerEntry.direction == EntryDirection.INCOME.value, LedgerEntry.amount),
+            else_=0,
+        )).label("income"),
+        func.sum(case(
+            (LedgerEntry.direction == EntryDirection.EXPENSE.value, LedgerEntry.amount),
+            else_=0,
+        )).label("expense"),
         func.sum(LedgerEntry.tax_amount).label("tax"),
-        func.count(LedgerEntry.id).label("count"),
+        func.count().label("count"),
     ).where(
+        LedgerEntry.user_id == user_id,
         LedgerEntry.entry_date >= period_start,
         LedgerEntry.entry_date <= period_end,
     )
@@ -68,7 +126,7 @@ async def get_summary(
     expense = row.expense or Decimal("0")
     tax = row.tax or Decimal("0")
     
-    return ReportSummary(
+    summary = ReportSummary(
         period_start=period_start,
         period_end=period_end,
         total_income=income,
@@ -77,45 +135,84 @@ async def get_summary(
         tax_total=tax,
         transaction_count=row.count,
     )
+    return _conditional_json(request, summary.model_dump_json().encode())
 
 
 @router.get("/by-vendor")
 async def get_by_vendor(
+    request: Request,
     period: str = Query("month"),
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Get spending breakdown by vendor."""
-    now = datetime.utcnow()
+    period_start, _ = _period_bounds(period)
     
-    if period == "week":
-        period_start = now - timedelta(days=7)
-    elif period == "month":
-        period_start = now.replace(day=1)
-    else:
-        period_start = now.replace(month=1, day=1)
-    
-    query = (
+    # Rank vendors on ledger_entries alone and join vendors for the names of
+    # the top 10 only, rather than grouping the join by display_name
+    top_vendors = (
         select(
-            Vendor.display_name,
+            LedgerEntry.vendor_id,
             func.sum(LedgerEntry.amount).label("total"),
-            func.count(LedgerEntry.id).label("count"),
+            func.count().label("count"),
         )
-        .join(LedgerEntry, Vendor.id == LedgerEntry.vendor_id)
         .where(
+            LedgerEntry.user_id == user_id,
             LedgerEntry.entry_date >= period_start,
             LedgerEntry.direction == EntryDirection.EXPENSE.value,
+            LedgerEntry.vendor_id.is_not(None),
         )
-        .group_by(Vendor.id, Vendor.display_name)
+        .group_by(LedgerEntry.vendor_id)
         .order_by(func.sum(LedgerEntry.amount).desc())
         .limit(10)
+        .subquery()
+    )
+    query = (
+        select(Vendor.display_name, top_vendors.c.total, top_vendors.c.count)
+        .join(top_vendors, Vendor.id == top_vendors.c.vendor_id)
+        .order_by(top_vendors.c.total.desc())
     )
     
     result = await db.execute(query)
     
-    return [
+    return _conditional_json(request, orjson.dumps([
         {"vendor": row.display_name, "total": float(row.total), "count": row.count}
         for row in result.all()
-    ]
+    ]))
+
+
+def _export_query(
+    start_date: datetime | None,
+    end_date: datetime | None,
+    as_float: bool = False,
+):
+    """
+    Exported columns of ledger entries, newest first.
+    
+    Plain row tuples skip ORM entity construction; with as_float the
+    amounts are cast in SQL so the driver returns floats, not Decimals.
+    """
+    amount = LedgerEntry.amount
+    tax = func.coalesce(LedgerEntry.tax_amount, 0)
+    if as_float:
+        amount = cast(amount, Float)
+        tax = cast(tax, Float)
+    
+    query = select(
+        LedgerEntry.entry_date,
+        LedgerEntry.direction,
+        amount.label("amount"),
+        tax.label("tax"),
+        LedgerEntry.currency,
+        LedgerEntry.notes,
+    ).order_by(LedgerEntry.entry_date.desc())
+    
+    if start_date:
+        query = query.where(LedgerEntry.entry_date >= start_date)
+    if end_date:
+        query = query.where(LedgerEntry.entry_date <= end_date)
+    
+    return query
 
 
 @router.get("/export/csv")
@@ -125,35 +222,35 @@ async def export_csv(
     db: AsyncSession = Depends(get_db),
 ):
     """Export ledger entries as CSV."""
-    query = select(LedgerEntry).order_by(LedgerEntry.entry_date.desc())
-    
-    if start_date:
-        query = query.where(LedgerEntry.entry_date >= start_date)
-    if end_date:
-        query = query.where(LedgerEntry.entry_date <= end_date)
+    query = _export_query(start_date, end_date)
     
-    result = await db.execute(query)
-    entries = result.scalars().all()
-    
-    # Build CSV
-    output = io.StringIO()
-    output.write("Tarih,Yön,Tutar,KDV,Para Birimi,Not\n")
-    
-    for entry in entries:
-        direction = "Gider" if entry.direction == "expense" else "Gelir"
-        output.write(
-            f"{entry.entry_date.strftime('%Y-%m-%d')},"
-            f"{direction},"
-            f"{entry.amount},"
-            f"{entry.tax_amount or 0},"
-            f"{entry.currency},"
-            f'"{entry.notes or ""}"\n'
-        )
+    # Rows are streamed from a server-side cursor and written out one batch
+    # at a time, so neither the result set nor the CSV body is held in memory
+    result = await db.stream(query.execution_options(yield_per=500))
     
-    output.seek(0)
+    async def csv_rows():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        yield "Tarih,Yön,Tutar,KDV,Para Birimi,Not\n"
+        
+        async for rows in result.partitions():
+            writer.writerows(
+                (
+                    row.entry_date.isoformat()[:10],
+                    DIRECTION_LABELS.get(row.direction, "Gelir"),
+                    row.amount,
+                    row.tax,
+                    row.currency,
+                    row.notes or "",
+                )
+                for row in rows
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
     
     return StreamingResponse(
-        iter([output.getvalue()]),
+        csv_rows(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=muhasebe_export.csv"},
     )
@@ -166,48 +263,50 @@ async def export_xlsx(
     db: AsyncSession = Depends(get_db),
 ):
     """Export ledger entries as XLSX."""
-    query = select(LedgerEntry).order_by(LedgerEntry.entry_date.desc())
+    query = _export_query(start_date, end_date, as_float=True)
     
-    if start_date:
-        query = query.where(LedgerEntry.entry_date >= start_date)
-    if end_date:
-        query = query.where(LedgerEntry.entry_date <= end_date)
-    
-    result = await db.execute(query)
-    entries = result.scalars().all()
+    result = await db.stream(query.execution_options(yield_per=1000))
     
-    # Build XLSX
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Muhasebe"
+    # Write-only workbooks serialize each appended row straight to the sheet
+    # XML instead of keeping every cell in memory
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Muhasebe")
     
-    # Headers
     headers = ["Tarih", "Yön", "Tutar", "KDV", "Para Birimi", "Not"]
-    for col, header in enumerate(headers, 1):
-        ws.cell(row=1, column=col, value=header)
-        ws.cell(row=1, column=col).font = openpyxl.styles.Font(bold=True)
-    
-    # Data
-    for row_num, entry in enumerate(entries, 2):
-        direction = "Gider" if entry.direction == "expense" else "Gelir"
-        ws.cell(row=row_num, column=1, value=entry.entry_date.strftime('%Y-%m-%d'))
-        ws.cell(row=row_num, column=2, value=direction)
-        ws.cell(row=row_num, column=3, value=float(entry.amount))
-        ws.cell(row=row_num, column=4, value=float(entry.tax_amount or 0))
-        ws.cell(row=row_num, column=5, value=entry.currency)
-        ws.cell(row=row_num, column=6, value=entry.notes or "")
-    
-    # Adjust column widths
     for col in range(1, len(headers) + 1):
         ws.column_dimensions[get_column_letter(col)].width = 15
     
-    # Save to buffer
-    output = io.BytesIO()
-    wb.save(output)
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    async for row in result:
+        ws.append([
+            row.entry_date.isoformat()[:10],
+            DIRECTION_LABELS.get(row.direction, "Gelir"),
+            row.amount,
+            row.tax,
+            row.currency,
+            row.notes or "",
+        ])
+    
+    # Small exports stay in memory, large ones spill to disk
+    output = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE)
+    await asyncio.to_thread(wb.save, output)
     output.seek(0)
     
+    async def xlsx_chunks():
+        try:
+            while chunk := output.read(EXPORT_CHUNK_SIZE):
+                yield chunk
+        finally:
+            output.close()
+    
     return StreamingResponse(
-        iter([output.getvalue()]),
+        xlsx_chunks(),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": "attachment; filename=muhasebe_export.xlsx"},
     )
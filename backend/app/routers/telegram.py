@@ -1,25 +1,29 @@
 """
 Telegram Bot webhook handler and message processing.
 """
+import asyncio
 import hashlib
 import logging
 import uuid
-from datetime import datetime
 from pathlib import Path
-from typing import Optional
-from collections import OrderedDict
+from typing import Coroutine, Optional
 import time
+from datetime import datetime
+from decimal import Decimal
 
-from fastapi import APIRouter, HTTPException, Header, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import select, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
+import aiofiles
 import httpx
 
 from app.config import get_settings
-from app.database import async_session_maker
+from app.database import async_session_maker, get_db
 from app.models.document import Document, DocumentStatus
+from app.models.ledger import LedgerEntry, EntryDirection
 from app.models.user import User
+from app.responses import ORJSONResponse
 from app.services.ocr_service import get_ocr_service
 from app.services.extraction_service import get_extraction_service
 from app.services.vendor_matcher import get_vendor_matcher
@@ -27,23 +31,33 @@ from app.services.vendor_matcher import get_vendor_matcher
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-router = APIRouter(prefix="/telegram", tags=["Telegram"])
+router = APIRouter(prefix="/telegram", tags=["Telegram"], default_response_class=ORJSONResponse)
 
-# Simple cache to prevent duplicate update processing (stores last 1000 update_ids)
-_processed_updates: OrderedDict[int, float] = OrderedDict()
+# Telegram retries webhook deliveries, so remember recently seen update_ids.
+# Two generations are kept: once the active set fills up (or gets old) it
+# becomes the previous one and the old previous set is dropped wholesale,
+# bounding memory to 2 * MAX_CACHE_SIZE ids without per-insert trimming
 MAX_CACHE_SIZE = 1000
+CACHE_ROTATE_SECONDS = 600
+
+_active_updates: set[int] = set()
+_previous_updates: set[int] = set()
+_rotated_at = time.monotonic()
 
 def is_duplicate_update(update_id: int) -> bool:
     """Check if we've already processed this update."""
-    if update_id in _processed_updates:
+    global _active_updates, _previous_updates, _rotated_at
+    
+    if update_id in _active_updates or update_id in _previous_updates:
         return True
     
-    # Add to cache
-    _processed_updates[update_id] = time.time()
+    _active_updates.add(update_id)
     
-    # Trim cache if too large
-    while len(_processed_updates) > MAX_CACHE_SIZE:
-        _processed_updates.popitem(last=False)
+    now = time.monotonic()
+    if len(_active_updates) >= MAX_CACHE_SIZE or now - _rotated_at > CACHE_ROTATE_SECONDS:
+        _previous_updates = _active_updates
+        _active_updates = set()
+        _rotated_at = now
     
     return False
 
@@ -111,12 +125,23 @@ class TelegramUpdate(BaseModel):
     callback_query: Optional[TelegramCallbackQuery] = None
 
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# One pooled client for all Bot API calls so consecutive requests reuse
+# keep-alive connections instead of a new TCP/TLS handshake each time
+http_client = httpx.AsyncClient(
+    timeout=30.0,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+)
+
+
 class TelegramBot:
     """Telegram Bot API wrapper."""
     
     def __init__(self, token: str):
         self.token = token
         self.api_base = f"https://api.telegram.org/bot{token}"
+        self.client = http_client
     
     async def send_message(
         self,
@@ -126,21 +151,19 @@ class TelegramBot:
         parse_mode: str = "HTML",
     ) -> dict:
         """Send a text message."""
-        async with httpx.AsyncClient() as client:
-            payload = {
-                "chat_id": chat_id,
-                "text": text,
-                "parse_mode": parse_mode,
-            }
-            if reply_markup:
-                payload["reply_markup"] = reply_markup
-            
-            response = await client.post(
-                f"{self.api_base}/sendMessage",
-                json=payload,
-                timeout=30.0,
-            )
-            return response.json()
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+        }
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        
+        response = await self.client.post(
+            f"{self.api_base}/sendMessage",
+            json=payload,
+        )
+        return response.json()
     
     async def answer_callback_query(
         self,
@@ -149,37 +172,46 @@ class TelegramBot:
         show_alert: bool = False,
     ) -> dict:
         """Answer a callback query."""
-        async with httpx.AsyncClient() as client:
-            payload = {
-                "callback_query_id": callback_query_id,
-                "show_alert": show_alert,
-            }
-            if text:
-                payload["text"] = text
-            
-            response = await client.post(
-                f"{self.api_base}/answerCallbackQuery",
-                json=payload,
-                timeout=30.0,
-            )
-            return response.json()
+        payload = {
+            "callback_query_id": callback_query_id,
+            "show_alert": show_alert,
+        }
+        if text:
+            payload["text"] = text
+        
+        response = await self.client.post(
+            f"{self.api_base}/answerCallbackQuery",
+            json=payload,
+        )
+        return response.json()
     
     async def get_file(self, file_id: str) -> dict:
         """Get file info for downloading."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.api_base}/getFile",
-                params={"file_id": file_id},
-                timeout=30.0,
-            )
-            return response.json()
+        response = await self.client.get(
+            f"{self.api_base}/getFile",
+            params={"file_id": file_id},
+        )
+        return response.json()
     
-    async def download_file(self, file_path: str) -> bytes:
-        """Download a file from Telegram servers."""
-        async with httpx.AsyncClient() as client:
-            url = f"https://api.telegram.org/file/bot{self.token}/{file_path}"
-            response = await client.get(url, timeout=60.0)
-            return response.content
+    async def download_file(self, file_path: str, dest: Path) -> str:
+        """
+        Download a file from Telegram servers into dest.
+        
+        The body is hashed while it is written, so it is read once and
+        never held in memory as a whole.
+        
+        Returns:
+            SHA-256 hex digest of the file
+        """
+        url = f"https://api.telegram.org/file/bot{self.token}/{file_path}"
+        hasher = hashlib.sha256()
+        async with self.client.stream("GET", url, timeout=60.0) as response:
+            response.raise_for_status()
+            async with aiofiles.open(dest, "wb") as out:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    hasher.update(chunk)
+                    await out.write(chunk)
+        return hasher.hexdigest()
     
     async def edit_message_text(
         self,
@@ -190,28 +222,105 @@ class TelegramBot:
         parse_mode: str = "HTML",
     ) -> dict:
         """Edit a message."""
-        async with httpx.AsyncClient() as client:
-            payload = {
-                "chat_id": chat_id,
-                "message_id": message_id,
-                "text": text,
-                "parse_mode": parse_mode,
-            }
-            if reply_markup:
-                payload["reply_markup"] = reply_markup
-            
-            response = await client.post(
-                f"{self.api_base}/editMessageText",
-                json=payload,
-                timeout=30.0,
-            )
-            return response.json()
+        payload = {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": parse_mode,
+        }
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        
+        response = await self.client.post(
+            f"{self.api_base}/editMessageText",
+            json=payload,
+        )
+        return response.json()
 
 
 # Create bot instance
 bot = TelegramBot(settings.telegram_bot_token) if settings.telegram_bot_token else None
 
 
+# Message templates
+START_MESSAGE = """
+👋 Merhaba <b>{name}</b>!
+
+Ben kişisel muhasebe asistanınım. 
+
+📸 Fiş veya fatura fotoğrafı gönderin, otomatik olarak işleyeyim.
+
+<b>Komutlar:</b>
+/report - Bu ayın özeti
+/export - Excel raporu al
+/help - Yardım
+"""
+
+HELP_MESSAGE = """
+<b>📚 Yardım</b>
+
+1️⃣ Fiş/fatura fotoğrafı gönderin
+2️⃣ OCR ile otomatik veri çıkarılır
+3️⃣ Taslağı onaylayın veya düzenleyin
+4️⃣ Raporlarınızı görüntüleyin
+
+<b>Komutlar:</b>
+/report - Aylık özet
+/export - Excel indirin
+/start - Başlangıç mesajı
+"""
+
+REPORT_MESSAGE = """
+📊 <b>Bu Ay Özeti</b>
+
+📈 Gelir: {income:,.2f} ₺
+📉 Gider: {expense:,.2f} ₺
+💰 Bakiye: {balance:,.2f} ₺
+📝 İşlem: {count}
+"""
+
+NEW_DRAFT_TITLE = "📋 <b>Taslak Oluşturuldu</b>"
+DUPLICATE_DRAFT_TITLE = "♻️ <b>Bu belge daha önce gönderilmiş</b>"
+
+DRAFT_MESSAGE = """
+{title}
+
+🏢 <b>Cari:</b> {vendor}
+📅 <b>Tarih:</b> {date}
+💰 <b>Tutar:</b> {amount}
+💸 <b>KDV:</b> {tax}
+
+Bu taslağı onaylayın veya düzenleyin.
+"""
+
+
+def _draft_keyboard(document_id: uuid.UUID) -> dict:
+    """Inline keyboard for confirming, editing or cancelling a draft."""
+    return {
+        "inline_keyboard": [
+            [
+                {"text": "✅ Onayla", "callback_data": f"confirm:{document_id}"},
+                {"text": "✏️ Düzenle", "callback_data": f"edit:{document_id}"},
+            ],
+            [
+                {"text": "❌ İptal", "callback_data": f"cancel:{document_id}"},
+            ],
+        ]
+    }
+
+
+# Strong references to in-flight background tasks; the event loop only keeps
+# weak ones, so an unreferenced task could be garbage collected mid-run
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _run_in_background(coro: Coroutine) -> None:
+    """Schedule a coroutine without waiting for it."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
 def verify_telegram_secret(secret: str) -> bool:
     """Verify the webhook secret token."""
     if not settings.telegram_webhook_secret:
@@ -219,26 +328,109 @@ def verify_telegram_secret(secret: str) -> bool:
     return secret == settings.telegram_webhook_secret
 
 
-async def get_or_create_user(telegram_id: str, name: str) -> User:
+async def get_or_create_user(db: AsyncSession, telegram_id: str, name: str) -> User:
     """Get or create a user by Telegram ID."""
+    result = await db.execute(
+        select(User).where(User.telegram_id == telegram_id)
+    )
+    user = result.scalar_one_or_none()
+    
+    if not user:
+        user = User(
+            telegram_id=telegram_id,
+            name=name,
+            is_active=True,
+        )
+        db.add(user)
+        await db.commit()
+        logger.info(f"Created new user: {name} ({telegram_id})")
+    
+    return user
+
+
+# Drafts being created right now, keyed by (user_id, image_sha256), so the
+# same photo arriving twice at once is OCR'd only once
+_pending_drafts: dict[tuple[uuid.UUID, str], asyncio.Task] = {}
+
+
+async def _get_or_create_photo_draft(
+    user: User,
+    local_path: Path,
+    file_hash: str,
+) -> tuple[Document, bool]:
+    """
+    Return the user's document for this image, creating a draft if needed.
+    
+    Returns:
+        (document, is_duplicate) - is_duplicate is True when an earlier
+        non-cancelled document with the same content was reused
+    """
+    key = (user.id, file_hash)
+    task = _pending_drafts.get(key)
+    if task is None:
+        task = asyncio.create_task(_find_or_create_photo_draft(user, local_path, file_hash))
+        _pending_drafts[key] = task
+        task.add_done_callback(lambda _: _pending_drafts.pop(key, None))
+        return await task
+    
+    document, _ = await task
+    return document, True
+
+
+async def _find_or_create_photo_draft(
+    user: User,
+    local_path: Path,
+    file_hash: str,
+) -> tuple[Document, bool]:
+    """Reuse a stored document with the same image, or OCR it into a new draft."""
     async with async_session_maker() as db:
-        result = await db.execute(
-            select(User).where(User.telegram_id == telegram_id)
+        existing = await db.scalar(
+            select(Document)
+            .where(
+                Document.user_id == user.id,
+                Document.image_sha256 == file_hash,
+                Document.status != DocumentStatus.CANCELLED.value,
+            )
+            .order_by(Document.created_at.desc())
+            .limit(1)
         )
-        user = result.scalar_one_or_none()
+        if existing:
+            return existing, True
         
-        if not user:
-            user = User(
-                telegram_id=telegram_id,
-                name=name,
-                is_active=True,
-            )
-            db.add(user)
-            await db.commit()
-            await db.refresh(user)
-            logger.info(f"Created new user: {name} ({telegram_id})")
+        ocr_service = get_ocr_service()
+        extraction_service = get_extraction_service()
+        vendor_matcher = get_vendor_matcher()
+        
+        ocr_result = await ocr_service.extract_text_async(str(local_path))
+        raw_text = ocr_result.get("text", "")
+        extraction = extraction_service.extract(raw_text)
+        
+        vendor_match = await vendor_matcher.find_match(
+            db,
+            user.id,
+            vendor_name=extraction.vendor_name,
+            vkn=extraction.vendor_vkn,
+        )
         
-        return user
+        document = Document(
+            user_id=user.id,
+            vendor_id=vendor_match.vendor_id if not vendor_match.is_new else None,
+            status=DocumentStatus.DRAFT.value,
+            doc_date=extraction.doc_date,
+            doc_no=extraction.doc_no,
+            currency=extraction.currency,
+            total_gross=extraction.total_gross,
+            total_tax=extraction.total_tax,
+            total_net=extraction.total_net,
+            raw_ocr_text=raw_text,
+            extraction_json=extraction.to_dict(),
+            confidence_score=extraction.confidence,
+            image_url=str(local_path),
+            image_sha256=file_hash,
+        )
+        db.add(document)
+        await db.commit()
+        return document, False
 
 
 async def process_photo(
@@ -248,8 +440,8 @@ async def process_photo(
     photo_sizes: list[TelegramPhotoSize],
 ) -> None:
     """Process a photo message - download, OCR, and create draft."""
-    # Get the largest photo
-    largest = max(photo_sizes, key=lambda p: p.file_size or 0)
+    # Telegram lists the sizes of a photo from smallest to largest
+    largest = photo_sizes[-1]
     
     try:
         # Notify user we're processing
@@ -262,87 +454,36 @@ async def process_photo(
             return
         
         file_path = file_info["result"]["file_path"]
-        content = await bot.download_file(file_path)
         
-        # Save locally
-        file_hash = hashlib.sha256(content).hexdigest()
+        # Download under a temporary name, then store it under its hash
         upload_dir = Path(settings.upload_dir)
         upload_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = upload_dir / f".{uuid.uuid4().hex}.part"
+        try:
+            file_hash = await bot.download_file(file_path, tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
         local_path = upload_dir / f"{file_hash}.jpg"
+        tmp_path.replace(local_path)
         
-        with open(local_path, "wb") as f:
-            f.write(content)
-        
-        # OCR processing
-        ocr_service = get_ocr_service()
-        extraction_service = get_extraction_service()
-        vendor_matcher = get_vendor_matcher()
-        
-        ocr_result = ocr_service.extract_text(str(local_path))
-        raw_text = ocr_result.get("text", "")
-        extraction = extraction_service.extract(raw_text)
-        
-        # Match vendor
-        async with async_session_maker() as db:
-            vendor_match = await vendor_matcher.find_match(
-                db,
-                user.id,
-                vendor_name=extraction.vendor_name,
-                vkn=extraction.vendor_vkn,
-            )
-            
-            # Create document
-            document = Document(
-                user_id=user.id,
-                vendor_id=vendor_match.vendor_id if not vendor_match.is_new else None,
-                status=DocumentStatus.DRAFT.value,
-                doc_date=extraction.doc_date,
-                doc_no=extraction.doc_no,
-                currency=extraction.currency,
-                total_gross=extraction.total_gross,
-                total_tax=extraction.total_tax,
-                total_net=extraction.total_net,
-                raw_ocr_text=raw_text,
-                extraction_json=extraction.to_dict(),
-                confidence_score=extraction.confidence,
-                image_url=str(local_path),
-                image_sha256=file_hash,
-            )
-            db.add(document)
-            await db.commit()
-            await db.refresh(document)
+        document, is_duplicate = await _get_or_create_photo_draft(user, local_path, file_hash)
         
         # Format response
-        vendor_text = extraction.vendor_name or "Bilinmeyen Cari"
-        date_text = extraction.doc_date.strftime("%d.%m.%Y") if extraction.doc_date else "-"
-        amount_text = f"{extraction.total_gross:.2f} ₺" if extraction.total_gross else "-"
-        tax_text = f"{extraction.total_tax:.2f} ₺" if extraction.total_tax else "0.00 ₺"
-        
-        message = f"""
-📋 <b>Taslak Oluşturuldu</b>
-
-🏢 <b>Cari:</b> {vendor_text}
-📅 <b>Tarih:</b> {date_text}
-💰 <b>Tutar:</b> {amount_text}
-💸 <b>KDV:</b> {tax_text}
-
-Bu taslağı onaylayın veya düzenleyin.
-"""
-        
-        # Inline keyboard
-        keyboard = {
-            "inline_keyboard": [
-                [
-                    {"text": "✅ Onayla", "callback_data": f"confirm:{document.id}"},
-                    {"text": "✏️ Düzenle", "callback_data": f"edit:{document.id}"},
-                ],
-                [
-                    {"text": "❌ İptal", "callback_data": f"cancel:{document.id}"},
-                ],
-            ]
-        }
+        extracted = document.extraction_json or {}
+        vendor_text = extracted.get("vendor_name") or "Bilinmeyen Cari"
+        date_text = document.doc_date.strftime("%d.%m.%Y") if document.doc_date else "-"
+        amount_text = f"{document.total_gross:.2f} ₺" if document.total_gross else "-"
+        tax_text = f"{document.total_tax:.2f} ₺" if document.total_tax else "0.00 ₺"
+        message = DRAFT_MESSAGE.format(
+            title=DUPLICATE_DRAFT_TITLE if is_duplicate else NEW_DRAFT_TITLE,
+            vendor=vendor_text,
+            date=date_text,
+            amount=amount_text,
+            tax=tax_text,
+        )
         
-        await bot.send_message(chat_id, message, reply_markup=keyboard)
+        await bot.send_message(chat_id, message, reply_markup=_draft_keyboard(document.id))
         
     except Exception as e:
         logger.error(f"Error processing photo: {e}")
@@ -350,6 +491,7 @@ Bu taslağı onaylayın veya düzenleyin.
 
 
 async def handle_callback(
+    db: AsyncSession,
     bot: TelegramBot,
     callback: TelegramCallbackQuery,
     user: User,
@@ -359,69 +501,70 @@ async def handle_callback(
     chat_id = callback.message.chat.id if callback.message else 0
     message_id = callback.message.message_id if callback.message else 0
     
+    # A callback query can only be answered once; collect the answer and the
+    # optional message edit, then send both together
+    answer: dict = {}
+    edit_text: Optional[str] = None
+    
     if data.startswith("confirm:"):
         doc_id = data.split(":")[1]
-        async with async_session_maker() as db:
-            result = await db.execute(
-                select(Document).where(Document.id == uuid.UUID(doc_id))
-            )
-            document = result.scalar_one_or_none()
-            
-            if document and document.status == DocumentStatus.DRAFT.value:
-                document.status = DocumentStatus.POSTED.value
-                document.updated_at = datetime.utcnow()
-                await db.commit()
-                
-                await bot.edit_message_text(
-                    chat_id,
-                    message_id,
-                    "✅ <b>Belge onaylandı!</b>\n\nKayıt deftere eklendi.",
-                )
-            else:
-                await bot.answer_callback_query(
-                    callback.id,
-                    text="Bu belge zaten işlenmiş.",
-                    show_alert=True,
-                )
+        result = await db.execute(
+            select(Document).where(Document.id == uuid.UUID(doc_id))
+        )
+        document = result.scalar_one_or_none()
+        
+        if document and document.status == DocumentStatus.DRAFT.value:
+            document.status = DocumentStatus.POSTED.value
+            await db.commit()
+            edit_text = "✅ <b>Belge onaylandı!</b>\n\nKayıt deftere eklendi."
+        else:
+            answer = {"text": "Bu belge zaten işlenmiş.", "show_alert": True}
     
     elif data.startswith("cancel:"):
         doc_id = data.split(":")[1]
-        async with async_session_maker() as db:
-            result = await db.execute(
-                select(Document).where(Document.id == uuid.UUID(doc_id))
-            )
-            document = result.scalar_one_or_none()
-            
-            if document:
-                document.status = DocumentStatus.CANCELLED.value
-                document.updated_at = datetime.utcnow()
-                await db.commit()
-                
-                # Show popup alert
-                await bot.answer_callback_query(
-                    callback.id,
-                    text="Fiş iptal edildi ✅",
-                    show_alert=True,
-                )
-                
-                await bot.edit_message_text(
-                    chat_id,
-                    message_id,
-                    "❌ <b>Belge iptal edildi.</b>",
-                )
+        result = await db.execute(
+            select(Document).where(Document.id == uuid.UUID(doc_id))
+        )
+        document = result.scalar_one_or_none()
+        
+        if document:
+            document.status = DocumentStatus.CANCELLED.value
+            await db.commit()
+            # Show popup alert
+            answer = {"text": "Fiş iptal edildi ✅", "show_alert": True}
+            edit_text = "❌ <b>Belge iptal edildi.</b>"
     
     elif data.startswith("edit:"):
-        await bot.answer_callback_query(
-            callback.id,
-            text="Düzenleme için web panelini kullanın.",
-            show_alert=True,
-        )
+        answer = {"text": "Düzenleme için web panelini kullanın.", "show_alert": True}
     
-    # Answer the callback
-    await bot.answer_callback_query(callback.id)
+    calls = [bot.answer_callback_query(callback.id, **answer)]
+    if edit_text:
+        calls.append(bot.edit_message_text(chat_id, message_id, edit_text))
+    await asyncio.gather(*calls)
+
+
+async def _user_month_summary(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    since: datetime,
+) -> tuple[Decimal, Decimal, int]:
+    """Return (income, expense, count) of a user's entries since a date."""
+    result = await db.execute(
+        select(
+            func.sum(case((LedgerEntry.direction == EntryDirection.INCOME.value, LedgerEntry.amount), else_=0)),
+            func.sum(case((LedgerEntry.direction == EntryDirection.EXPENSE.value, LedgerEntry.amount), else_=0)),
+            func.count(),
+        ).where(
+            LedgerEntry.user_id == user_id,
+            LedgerEntry.entry_date >= since,
+        )
+    )
+    income, expense, count = result.one()
+    return income or Decimal("0"), expense or Decimal("0"), count
 
 
 async def handle_command(
+    db: AsyncSession,
     bot: TelegramBot,
     chat_id: int,
     user: User,
@@ -429,68 +572,20 @@ async def handle_command(
 ) -> None:
     """Handle bot commands."""
     if command == "/start":
-        await bot.send_message(
-            chat_id,
-            f"""
-👋 Merhaba <b>{user.name}</b>!
-
-Ben kişisel muhasebe asistanınım. 
-
-📸 Fiş veya fatura fotoğrafı gönderin, otomatik olarak işleyeyim.
-
-<b>Komutlar:</b>
-/report - Bu ayın özeti
-/export - Excel raporu al
-/help - Yardım
-""",
-        )
+        await bot.send_message(chat_id, START_MESSAGE.format(name=user.name))
     
     elif command == "/help":
-        await bot.send_message(
-            chat_id,
-            """
-<b>📚 Yardım</b>
-
-1️⃣ Fiş/fatura fotoğrafı gönderin
-2️⃣ OCR ile otomatik veri çıkarılır
-3️⃣ Taslağı onaylayın veya düzenleyin
-4️⃣ Raporlarınızı görüntüleyin
-
-<b>Komutlar:</b>
-/report - Aylık özet
-/export - Excel indirin
-/start - Başlangıç mesajı
-""",
-        )
+        await bot.send_message(chat_id, HELP_MESSAGE)
     
     elif command == "/report":
-        async with async_session_maker() as db:
-            from sqlalchemy import func
-            from app.models.ledger import LedgerEntry
-            
-            result = await db.execute(
-                select(
-                    func.sum(LedgerEntry.amount).filter(LedgerEntry.direction == "income"),
-                    func.sum(LedgerEntry.amount).filter(LedgerEntry.direction == "expense"),
-                    func.count(LedgerEntry.id),
-                ).where(LedgerEntry.user_id == user.id)
-            )
-            row = result.first()
-            income = row[0] or 0
-            expense = row[1] or 0
-            count = row[2] or 0
-            balance = income - expense
+        now = datetime.utcnow()
+        month_start = datetime(now.year, now.month, 1)
+        income, expense, count = await _user_month_summary(db, user.id, month_start)
+        balance = income - expense
         
         await bot.send_message(
             chat_id,
-            f"""
-📊 <b>Bu Ay Özeti</b>
-
-📈 Gelir: {income:,.2f} ₺
-📉 Gider: {expense:,.2f} ₺
-💰 Bakiye: {balance:,.2f} ₺
-📝 İşlem: {count}
-""",
+            REPORT_MESSAGE.format(income=income, expense=expense, balance=balance, count=count),
         )
 
 
@@ -498,6 +593,7 @@ Ben kişisel muhasebe asistanınım.
 async def telegram_webhook(
     request: Request,
     x_telegram_bot_api_secret_token: str = Header(None),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Telegram webhook endpoint.
@@ -531,16 +627,17 @@ async def telegram_webhook(
             
             # Get or create user
             user_name = message.from_user.first_name if message.from_user else "Unknown"
-            user = await get_or_create_user(str(chat_id), user_name)
+            user = await get_or_create_user(db, str(chat_id), user_name)
             
-            # Handle photo
+            # Handle photo - download and OCR take longer than Telegram waits
+            # for a webhook reply, so acknowledge now and process in the background
             if message.photo:
-                await process_photo(bot, chat_id, user, message.photo)
+                _run_in_background(process_photo(bot, chat_id, user, message.photo))
             
             # Handle command
             elif message.text and message.text.startswith("/"):
                 command = message.text.split()[0].lower()
-                await handle_command(bot, chat_id, user, command)
+                await handle_command(db, bot, chat_id, user, command)
             
             # Handle regular text
             elif message.text:
@@ -552,8 +649,8 @@ async def telegram_webhook(
         elif update.callback_query:
             callback = update.callback_query
             user_name = callback.from_user.first_name
-            user = await get_or_create_user(str(callback.from_user.id), user_name)
-            await handle_callback(bot, callback, user)
+            user = await get_or_create_user(db, str(callback.from_user.id), user_name)
+            await handle_callback(db, bot, callback, user)
         
         return {"ok": True}
     
@@ -574,17 +671,15 @@ async def set_webhook(webhook_url: str):
             detail="Telegram bot not configured",
         )
     
-    async with httpx.AsyncClient() as client:
-        payload = {
-            "url": webhook_url,
-            "allowed_updates": ["message", "callback_query"],
-        }
-        if settings.telegram_webhook_secret:
-            payload["secret_token"] = settings.telegram_webhook_secret
-        
-        response = await client.post(
-            f"{bot.api_base}/setWebhook",
-            json=payload,
-            timeout=30.0,
-        )
-        return response.json()
+    payload = {
+        "url": webhook_url,
+        "allowed_updates": ["message", "callback_query"],
+    }
+    if settings.telegram_webhook_secret:
+        payload["secret_token"] = settings.telegram_webhook_secret
+    
+    response = await bot.client.post(
+        f"{bot.api_base}/setWebhook",
+        json=payload,
+    )
+    return response.json()
@@ -1,14 +1,20 @@
 """
 Vendor (Cari) endpoints.
 """
+import functools
 import re
 import uuid
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select, or_, func
+from sqlalchemy import select, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.auth import get_current_user_id
 from app.database import get_db
 from app.models.vendor import Vendor, VendorAlias
 from app.schemas.vendor import (
@@ -21,17 +27,44 @@ from app.schemas.vendor import (
 router = APIRouter(prefix="/vendors", tags=["Vendors"])
 
 
+# Autocomplete only serializes VendorSummary; select those columns as plain
+# rows so neither the other vendor columns nor the aliases are loaded
+VENDOR_SUMMARY_COLUMNS = (
+    Vendor.id,
+    Vendor.display_name,
+    Vendor.vkn,
+)
+
+_SUFFIX_RE = re.compile(r'\b(ltd|a\.?s\.?|tic\.?|san\.?|ltd\.?\s*şti\.?)\b')
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_WS_RE = re.compile(r'\s+')
+
+
+# The same few vendor names come back on every receipt and alias
+@functools.lru_cache(maxsize=4096)
 def normalize_name(name: str) -> str:
     """Normalize vendor name for matching."""
     # Lowercase
     name = name.lower()
     # Remove common suffixes
-    name = re.sub(r'\b(ltd|a\.?s\.?|tic\.?|san\.?|ltd\.?\s*şti\.?)\b', '', name)
+    name = _SUFFIX_RE.sub('', name)
     # Remove punctuation
-    name = re.sub(r'[^\w\s]', '', name)
+    name = _PUNCT_RE.sub('', name)
     # Remove extra whitespace
-    name = ' '.join(name.split())
-    return name.strip()
+    return _WS_RE.sub(' ', name).strip()
+
+
+async def _get_vendor(
+    db: AsyncSession,
+    vendor_id: uuid.UUID,
+    user_id: uuid.UUID,
+) -> Vendor | None:
+    """Load one of the user's vendors with the aliases VendorResponse serializes."""
+    return await db.scalar(
+        select(Vendor)
+        .where(Vendor.id == vendor_id, Vendor.user_id == user_id)
+        .options(selectinload(Vendor.aliases))
+    )
 
 
 @router.get("/", response_model=list[VendorResponse])
@@ -40,16 +73,24 @@ async def list_vendors(
     limit: int = 50,
     offset: int = 0,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """List all vendors with optional search."""
-    query = select(Vendor).order_by(Vendor.display_name)
+    query = (
+        select(Vendor)
+        .where(Vendor.user_id == user_id)
+        .order_by(Vendor.display_name)
+        .options(selectinload(Vendor.aliases))
+    )
     
     if search:
-        search_term = f"%{search.lower()}%"
+        # Every branch is served by a pg_trgm GIN index; wrapping a column
+        # in lower() would hide it from those indexes
+        search_term = f"%{search}%"
         query = query.where(
             or_(
-                func.lower(Vendor.display_name).like(search_term),
-                func.lower(Vendor.normalized_name).like(search_term),
+                Vendor.display_name.ilike(search_term),
+                Vendor.normalized_name.like(search_term.lower()),
                 Vendor.vkn.like(search_term),
             )
         )
@@ -63,33 +104,33 @@ async def list_vendors(
 async def search_vendors(
     q: Annotated[str, Query(min_length=2)],
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Quick search for vendor autocomplete."""
-    search_term = f"%{q.lower()}%"
+    search_term = f"%{q}%"
     query = (
-        select(Vendor)
+        select(*VENDOR_SUMMARY_COLUMNS)
         .where(
+            Vendor.user_id == user_id,
             or_(
-                func.lower(Vendor.display_name).like(search_term),
-                func.lower(Vendor.normalized_name).like(search_term),
+                Vendor.display_name.ilike(search_term),
+                Vendor.normalized_name.like(search_term.lower()),
             )
         )
         .limit(10)
     )
     result = await db.execute(query)
-    return result.scalars().all()
+    return result.all()
 
 
 @router.get("/{vendor_id}", response_model=VendorResponse)
 async def get_vendor(
     vendor_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Get a specific vendor by ID."""
-    result = await db.execute(
-        select(Vendor).where(Vendor.id == vendor_id)
-    )
-    vendor = result.scalar_one_or_none()
+    vendor = await _get_vendor(db, vendor_id, user_id)
     
     if not vendor:
         raise HTTPException(
@@ -104,42 +145,52 @@ async def get_vendor(
 async def create_vendor(
     data: VendorCreate,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Create a new vendor."""
-    # Check for duplicate VKN
-    if data.vkn:
-        existing = await db.execute(
-            select(Vendor).where(Vendor.vkn == data.vkn)
+    # The unique (user_id, vkn) constraint rejects duplicates atomically;
+    # an empty RETURNING means the VKN is already taken
+    stmt = (
+        insert(Vendor)
+        .values(
+            user_id=user_id,
+            display_name=data.display_name,
+            normalized_name=normalize_name(data.display_name),
+            vkn=data.vkn,
+            tckn=data.tckn,
+            address=data.address,
+            phone=data.phone,
+            notes=data.notes,
         )
-        if existing.scalar_one_or_none():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Vendor with this VKN already exists",
-            )
-    
-    vendor = Vendor(
-        user_id=uuid.UUID("00000000-0000-0000-0000-000000000001"),  # TODO: get from auth
-        display_name=data.display_name,
-        normalized_name=normalize_name(data.display_name),
-        vkn=data.vkn,
-        tckn=data.tckn,
-        address=data.address,
-        phone=data.phone,
-        notes=data.notes,
+        .on_conflict_do_nothing(index_elements=[Vendor.user_id, Vendor.vkn])
+        .returning(Vendor)
+        .options(noload(Vendor.aliases))
     )
-    db.add(vendor)
+    vendor = await db.scalar(stmt)
     
-    # Add aliases
-    for alias_name in data.aliases:
-        alias = VendorAlias(
-            vendor_id=vendor.id,
-            alias=alias_name,
-            normalized_alias=normalize_name(alias_name),
+    if not vendor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Vendor with this VKN already exists",
         )
-        db.add(alias)
     
+    aliases = []
+    if data.aliases:
+        result = await db.scalars(
+            insert(VendorAlias).returning(VendorAlias, sort_by_parameter_order=True),
+            [
+                {
+                    "vendor_id": vendor.id,
+                    "alias": alias_name,
+                    "normalized_alias": normalize_name(alias_name),
+                }
+                for alias_name in data.aliases
+            ],
+        )
+        aliases = result.all()
+    # The vendor is new, so these are all of its aliases
+    set_committed_value(vendor, "aliases", aliases)
     await db.commit()
-    await db.refresh(vendor)
     
     return vendor
 
@@ -149,12 +200,37 @@ async def update_vendor(
     vendor_id: uuid.UUID,
     data: VendorUpdate,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Update a vendor."""
-    result = await db.execute(
-        select(Vendor).where(Vendor.id == vendor_id)
-    )
-    vendor = result.scalar_one_or_none()
+    update_data = data.model_dump(exclude_unset=True)
+    
+    if "display_name" in update_data:
+        update_data["normalized_name"] = normalize_name(update_data["display_name"])
+    
+    if update_data:
+        # Write and read back the row in one UPDATE ... RETURNING instead of
+        # loading the vendor first; populate_existing refreshes a vendor the
+        # session may already hold
+        stmt = (
+            update(Vendor)
+            .where(Vendor.id == vendor_id, Vendor.user_id == user_id)
+            .values(**update_data)
+            .returning(Vendor)
+            .options(selectinload(Vendor.aliases))
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        try:
+            vendor = await db.scalar(stmt)
+        except IntegrityError:
+            # uq_vendors_user_vkn: another of the user's vendors has this VKN
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Vendor with this VKN already exists",
+            )
+    else:
+        vendor = await _get_vendor(db, vendor_id, user_id)
     
     if not vendor:
         raise HTTPException(
@@ -162,16 +238,7 @@ async def update_vendor(
             detail="Vendor not found",
         )
     
-    update_data = data.model_dump(exclude_unset=True)
-    
-    if "display_name" in update_data:
-        update_data["normalized_name"] = normalize_name(update_data["display_name"])
-    
-    for field, value in update_data.items():
-        setattr(vendor, field, value)
-    
     await db.commit()
-    await db.refresh(vendor)
     
     return vendor
 
@@ -181,12 +248,10 @@ async def add_vendor_alias(
     vendor_id: uuid.UUID,
     alias_name: str,
     db: AsyncSession = Depends(get_db),
+    user_id: uuid.UUID = Depends(get_current_user_id),
 ):
     """Add an alias to a vendor."""
-    result = await db.execute(
-        select(Vendor).where(Vendor.id == vendor_id)
-    )
-    vendor = result.scalar_one_or_none()
+    vendor = await _get_vendor(db, vendor_id, user_id)
     
     if not vendor:
         raise HTTPException(
@@ -194,13 +259,9 @@ async def add_vendor_alias(
             detail="Vendor not found",
         )
     
-    alias = VendorAlias(
-        vendor_id=vendor.id,
-        alias=alias_name,
-        normalized_alias=normalize_name(alias_name),
+    vendor.aliases.append(
+        VendorAlias(alias=alias_name, normalized_alias=normalize_name(alias_name))
     )
-    db.add(alias)
     await db.commit()
-    await db.refresh(vendor)
     
     return vendor
@@ -5,7 +5,7 @@ from datetime import datetime, date
 from decimal import Decimal
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 
 from app.models.document import DocumentStatus, DocumentType
 
@@ -2,19 +2,16 @@
 Seed data script for initial data population.
 """
 import asyncio
-import uuid
 from datetime import datetime
 
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.auth import DEFAULT_USER_ID
 from app.database import async_session_maker
 from app.models import User, Category, Vendor
 
 
-# Default user for single-user mode
-DEFAULT_USER_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
-
-
 # Default categories
 DEFAULT_CATEGORIES = [
     {"name": "Market", "icon": "🛒", "color": "#22c55e"},
@@ -39,16 +36,19 @@ DEMO_VENDORS = [
     {"display_name": "CarrefourSA", "vkn": "6677889900"},
 ]
 
+# Insert rows for the default user, built once at import
+_CATEGORY_ROWS = [{"user_id": DEFAULT_USER_ID, **c} for c in DEFAULT_CATEGORIES]
+_DEMO_VENDOR_ROWS = [
+    {"user_id": DEFAULT_USER_ID, "normalized_name": v["display_name"].lower(), **v}
+    for v in DEMO_VENDORS
+]
+
 
 async def seed_database():
     """Populate database with initial seed data."""
     async with async_session_maker() as session:
         # Check if default user exists
-        from sqlalchemy import select
-        result = await session.execute(
-            select(User).where(User.id == DEFAULT_USER_ID)
-        )
-        user = result.scalar_one_or_none()
+        user = await session.get(User, DEFAULT_USER_ID)
         
         if not user:
             # Create default user
@@ -61,38 +61,23 @@ async def seed_database():
             session.add(user)
             print("✓ Created default user")
         
-        # Create categories if not exist
-        result = await session.execute(
-            select(Category).where(Category.user_id == DEFAULT_USER_ID)
+        # Create categories if not exist; the probes stop at the first row
+        # and the rows go in as one executemany INSERT
+        has_categories = await session.scalar(
+            select(1).where(Category.user_id == DEFAULT_USER_ID).limit(1)
         )
-        existing_categories = result.scalars().all()
         
-        if not existing_categories:
-            for cat_data in DEFAULT_CATEGORIES:
-                category = Category(
-                    user_id=DEFAULT_USER_ID,
-                    name=cat_data["name"],
-                    icon=cat_data["icon"],
-                    color=cat_data["color"],
-                )
-                session.add(category)
+        if not has_categories:
+            await session.execute(insert(Category), _CATEGORY_ROWS)
             print(f"✓ Created {len(DEFAULT_CATEGORIES)} categories")
         
         # Create demo vendors if not exist
-        result = await session.execute(
-            select(Vendor).where(Vendor.user_id == DEFAULT_USER_ID)
+        has_vendors = await session.scalar(
+            select(1).where(Vendor.user_id == DEFAULT_USER_ID).limit(1)
         )
-        existing_vendors = result.scalars().all()
         
-        if not existing_vendors:
-            for vendor_data in DEMO_VENDORS:
-                vendor = Vendor(
-                    user_id=DEFAULT_USER_ID,
-                    display_name=vendor_data["display_name"],
-                    normalized_name=vendor_data["display_name"].lower(),
-                    vkn=vendor_data.get("vkn"),
-                )
-                session.add(vendor)
+        if not has_vendors:
+            await session.execute(insert(Vendor), _DEMO_VENDOR_ROWS)
             print(f"✓ Created {len(DEMO_VENDORS)} demo vendors")
         
         await session.commit()
@@ -8,6 +8,7 @@ from datetime import datetime, date
 from decimal import Decimal, InvalidOperation
 from typing import Optional
 from dataclasses import dataclass, asdict
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -46,8 +47,11 @@ class ExtractionService:
     Optimized for Turkish receipts and invoices.
     """
 
+    # Patterns are compiled once here rather than looked up in re's cache
+    # on every search
+    
     # Date patterns commonly used in Turkish receipts
-    DATE_PATTERNS = [
+    DATE_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in [
         # DD.MM.YYYY or DD/MM/YYYY
         r'(\d{1,2})[./](\d{1,2})[./](20\d{2})',
         # DD-MM-YYYY
@@ -56,7 +60,7 @@ class ExtractionService:
         r'(20\d{2})[./](\d{1,2})[./](\d{1,2})',
         # DD MONTH YYYY (Turkish)
         r'(\d{1,2})\s+(Ocak|Şubat|Mart|Nisan|Mayıs|Haziran|Temmuz|Ağustos|Eylül|Ekim|Kasım|Aralık)\s+(20\d{2})',
-    ]
+    ])
     
     # Turkish month names
     TURKISH_MONTHS = {
@@ -66,14 +70,14 @@ class ExtractionService:
     }
     
     # Amount patterns for Turkish Lira
-    AMOUNT_PATTERNS = [
+    AMOUNT_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in [
         # *1.234,56 or *1234,56 (with asterisk prefix common in receipts)
         r'\*?\s*(\d{1,3}(?:\.\d{3})*(?:,\d{2}))',
         # 1.234,56 TL or 1234,56 TL
         r'(\d{1,3}(?:\.\d{3})*(?:,\d{2}))\s*(?:TL|TRY|₺)',
         # Just the amount pattern
         r'(\d{1,3}(?:\.\d{3})*,\d{2})',
-    ]
+    ])
     
     # Total keywords in Turkish
     TOTAL_KEYWORDS = [
@@ -89,14 +93,33 @@ class ExtractionService:
     ]
     
     # VKN/TCKN patterns
-    VKN_PATTERN = r'(?:VKN|V\.K\.N|VERGİ\s*(?:KİMLİK)?\s*(?:NO|NUMARASI)?)[:\s]*(\d{10,11})'
-    TCKN_PATTERN = r'(?:TCKN|T\.C\.?(?:\s*KİMLİK)?\s*(?:NO|NUMARASI)?)[:\s]*(\d{11})'
+    VKN_PATTERN = re.compile(
+        r'(?:VKN|V\.K\.N|VERGİ\s*(?:KİMLİK)?\s*(?:NO|NUMARASI)?)[:\s]*(\d{10,11})',
+        re.IGNORECASE,
+    )
+    TCKN_PATTERN = re.compile(
+        r'(?:TCKN|T\.C\.?(?:\s*KİMLİK)?\s*(?:NO|NUMARASI)?)[:\s]*(\d{11})',
+        re.IGNORECASE,
+    )
+    # Standalone VKN near tax-related words
+    BARE_VKN_PATTERN = re.compile(r'\b(\d{10,11})\b')
     
     # Document number patterns
-    DOC_NO_PATTERNS = [
+    DOC_NO_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in [
         r'(?:FİŞ|BELGE|FATURA)\s*(?:NO|NUMARASI?)[:\s]*([A-Z0-9\-]+)',
         r'(?:NO|NUMARA)[:\s]*([A-Z0-9\-]+)',
-    ]
+    ])
+    
+    # Header lines made only of digits/separators (dates, phone numbers)
+    NUMERIC_LINE_PATTERN = re.compile(r'^[\d\s\-\./]+$')
+    # Tax rate ("KDV %18") and the amount following it
+    TAX_RATE_PATTERN = re.compile(r'%\s*\d+')
+    TAX_RATE_AMOUNT_PATTERN = re.compile(r'%\s*\d+\s*[:\s]*(\d{1,3}(?:\.\d{3})*,\d{2})')
+    # Drops currency marks, spaces and thousand separators (dots) and turns
+    # the decimal comma into a point, all in one str.translate() pass
+    AMOUNT_TRANSLATION = str.maketrans(
+        {c: None for c in 'TL₺ \t\n\r\f\v\xa0.'} | {',': '.'}
+    )
 
     def extract(self, ocr_text: str) -> ExtractionResult:
         """
@@ -111,28 +134,28 @@ class ExtractionService:
         if not ocr_text:
             return ExtractionResult()
         
-        # Normalize text
-        text = ocr_text.upper()
-        text_lower = ocr_text.lower()
+        # Lowercase each line once for the keyword lookups; the patterns are
+        # case-insensitive and run on the original text
         lines = ocr_text.split('\n')
+        lines_lower = [line.lower() for line in lines]
         
         # Track what we found for confidence calculation
         found_fields = []
         details = {}
         
         # Extract vendor name (usually first non-empty lines)
-        vendor_name = self._extract_vendor_name(lines)
+        vendor_name = self._extract_vendor_name(lines, lines_lower)
         if vendor_name:
             found_fields.append('vendor_name')
             details['vendor_name_source'] = 'header'
         
         # Extract VKN
-        vkn = self._extract_vkn(text)
+        vkn = self._extract_vkn(ocr_text, lines, lines_lower)
         if vkn:
             found_fields.append('vkn')
         
         # Extract TCKN
-        tckn = self._extract_tckn(text)
+        tckn = self._extract_tckn(ocr_text)
         if tckn:
             found_fields.append('tckn')
         
@@ -141,18 +164,16 @@ class ExtractionService:
         if doc_date:
             found_fields.append('doc_date')
         
-        # Extract total amount
-        total_gross = self._extract_total(text_lower, lines)
+        # Extract total and tax amounts
+        total_gross, total_tax = self._extract_totals(ocr_text, lines, lines_lower)
         if total_gross:
             found_fields.append('total_gross')
         
-        # Extract tax amount
-        total_tax = self._extract_tax(text_lower, lines)
         if total_tax:
             found_fields.append('total_tax')
         
         # Extract document number
-        doc_no = self._extract_doc_no(text)
+        doc_no = self._extract_doc_no(ocr_text)
         if doc_no:
             found_fields.append('doc_no')
         
@@ -187,27 +208,32 @@ class ExtractionService:
             extraction_details=details,
         )
 
-    def _extract_vendor_name(self, lines: list[str]) -> Optional[str]:
+    def _extract_vendor_name(self, lines: list[str], lines_lower: list[str]) -> Optional[str]:
         """Extract vendor name from the first lines."""
-        for line in lines[:5]:  # Check first 5 lines
+        for line, line_lower in zip(lines[:5], lines_lower):  # Check first 5 lines
             line = line.strip()
             # Skip empty lines, dates, and numeric lines
             if not line:
                 continue
-            if re.match(r'^[\d\s\-\./]+$', line):
+            if self.NUMERIC_LINE_PATTERN.match(line):
                 continue
             if len(line) < 3:
                 continue
             # Skip lines that look like addresses
-            if any(k in line.lower() for k in ['sok.', 'cad.', 'mah.', 'no:', 'apt']):
+            if any(k in line_lower for k in ['sok.', 'cad.', 'mah.', 'no:', 'apt']):
                 continue
             # This is likely the vendor name
             return line
         return None
 
-    def _extract_vkn(self, text: str) -> Optional[str]:
+    def _extract_vkn(
+        self,
+        text: str,
+        lines: list[str],
+        lines_lower: list[str],
+    ) -> Optional[str]:
         """Extract VKN (Vergi Kimlik Numarası)."""
-        match = re.search(self.VKN_PATTERN, text, re.IGNORECASE)
+        match = self.VKN_PATTERN.search(text)
         if match:
             vkn = match.group(1)
             # VKN should be 10 or 11 digits
@@ -217,18 +243,41 @@ class ExtractionService:
         # Try to find standalone 10-11 digit number near tax-related words
         tax_words = ['vergi', 'vkn', 'dairesi']
         for word in tax_words:
-            idx = text.lower().find(word)
+            idx = self._find_keyword(lines, lines_lower, word)
             if idx >= 0:
-                nearby = text[idx:idx+50]
-                numbers = re.findall(r'\b(\d{10,11})\b', nearby)
-                if numbers:
-                    return numbers[0]
+                # First number starting within 50 characters of the word,
+                # read in full even if it runs past them
+                number = self.BARE_VKN_PATTERN.search(text, idx)
+                if number and number.start() < idx + 50:
+                    return number.group(1)
         
         return None
 
+    @staticmethod
+    def _find_keyword(lines: list[str], lines_lower: list[str], word: str) -> int:
+        """
+        Offset of the first occurrence of a lowercase keyword in the original
+        text, or -1.
+        
+        lower() turns 'İ' into two code points, so offsets in the lowercased
+        lines are mapped back to characters of the original line.
+        """
+        line_start = 0
+        for line, line_lower in zip(lines, lines_lower):
+            idx = line_lower.find(word)
+            if idx >= 0:
+                lowered = 0
+                for offset, char in enumerate(line):
+                    if lowered >= idx:
+                        return line_start + offset
+                    lowered += len(char.lower())
+                return line_start + len(line)
+            line_start += len(line) + 1
+        return -1
+
     def _extract_tckn(self, text: str) -> Optional[str]:
         """Extract TCKN (TC Kimlik Numarası)."""
-        match = re.search(self.TCKN_PATTERN, text, re.IGNORECASE)
+        match = self.TCKN_PATTERN.search(text)
         if match:
             tckn = match.group(1)
             if len(tckn) == 11:
@@ -238,7 +287,7 @@ class ExtractionService:
     def _extract_date(self, text: str) -> Optional[date]:
         """Extract date from text."""
         for pattern in self.DATE_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = pattern.search(text)
             if match:
                 try:
                     groups = match.groups()
@@ -268,88 +317,99 @@ class ExtractionService:
         Parse Turkish formatted amount (1.234,56) to Decimal.
         """
         try:
-            # Remove spaces and currency symbols
-            cleaned = amount_str.strip()
-            cleaned = re.sub(r'[TL₺\s]', '', cleaned)
-            
-            # Remove thousand separators (dots) and replace decimal comma
-            cleaned = cleaned.replace('.', '').replace(',', '.')
-            
-            return Decimal(cleaned)
+            return Decimal(amount_str.translate(self.AMOUNT_TRANSLATION))
         except (InvalidOperation, ValueError):
             return None
 
-    def _extract_total(self, text: str, lines: list[str]) -> Optional[Decimal]:
-        """Extract total amount."""
-        # First, look for lines containing total keywords
-        for keyword in self.TOTAL_KEYWORDS:
-            for line in lines:
-                line_lower = line.lower()
-                if keyword in line_lower:
-                    # Find amount in this line
-                    for pattern in self.AMOUNT_PATTERNS:
-                        match = re.search(pattern, line, re.IGNORECASE)
-                        if match:
-                            amount = self._parse_turkish_amount(match.group(1))
-                            if amount and amount > 0:
-                                return amount
+    def _extract_totals(
+        self, text: str, lines: list[str], lines_lower: list[str]
+    ) -> tuple[Optional[Decimal], Optional[Decimal]]:
+        """
+        Extract total and tax (KDV) amounts in a single pass over the lines.
+        
+        The earliest keyword in TOTAL_KEYWORDS/TAX_KEYWORDS that appears on a
+        line with an amount wins (first such line), as if the keywords were
+        searched one after another. Once a keyword has matched only the
+        higher-priority ones are looked for, and the scan stops as soon as
+        both lists' first keywords have matched.
+        """
+        total = tax = None
+        total_rank = len(self.TOTAL_KEYWORDS)
+        tax_rank = len(self.TAX_KEYWORDS)
         
-        # Fallback: find the largest amount (often the total)
+        for line, line_lower in zip(lines, lines_lower):
+            rank = self._keyword_rank(self.TOTAL_KEYWORDS, total_rank, line_lower)
+            if rank is not None:
+                amount = self._line_amount(line)
+                if amount:
+                    total, total_rank = amount, rank
+            
+            rank = self._keyword_rank(self.TAX_KEYWORDS, tax_rank, line_lower)
+            if rank is not None:
+                amount = self._line_tax_amount(line)
+                if amount:
+                    tax, tax_rank = amount, rank
+            
+            if total_rank == 0 and tax_rank == 0:
+                break
+        
+        if total is None:
+            total = self._largest_amount(text)
+        return total, tax
+
+    @staticmethod
+    def _keyword_rank(keywords: list[str], limit: int, line_lower: str) -> Optional[int]:
+        """Index of the first of keywords[:limit] contained in the line."""
+        for i in range(limit):
+            if keywords[i] in line_lower:
+                return i
+        return None
+
+    def _line_amount(self, line: str) -> Optional[Decimal]:
+        """First positive amount on a line."""
+        for pattern in self.AMOUNT_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                amount = self._parse_turkish_amount(match.group(1))
+                if amount and amount > 0:
+                    return amount
+        return None
+
+    def _line_tax_amount(self, line: str) -> Optional[Decimal]:
+        """Tax amount on a tax line, skipping the rate in "KDV %18 ..." lines."""
+        if self.TAX_RATE_PATTERN.search(line):
+            # Find amount after the rate
+            match = self.TAX_RATE_AMOUNT_PATTERN.search(line)
+            if match:
+                amount = self._parse_turkish_amount(match.group(1))
+                if amount and amount > 0:
+                    return amount
+            return None
+        return self._line_amount(line)
+
+    def _largest_amount(self, text: str) -> Optional[Decimal]:
+        """Largest amount anywhere in the text (fallback for the total)."""
         all_amounts = []
         for pattern in self.AMOUNT_PATTERNS:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for m in matches:
+            for m in pattern.findall(text):
                 amount = self._parse_turkish_amount(m)
                 if amount and amount > 0:
                     all_amounts.append(amount)
         
-        if all_amounts:
-            # Return the largest amount
-            return max(all_amounts)
-        
-        return None
-
-    def _extract_tax(self, text: str, lines: list[str]) -> Optional[Decimal]:
-        """Extract tax (KDV) amount."""
-        for keyword in self.TAX_KEYWORDS:
-            for line in lines:
-                line_lower = line.lower()
-                if keyword in line_lower:
-                    # Skip if this is a rate line (e.g., "KDV %18")
-                    if re.search(r'%\s*\d+', line):
-                        # Find amount after the rate
-                        match = re.search(r'%\s*\d+\s*[:\s]*(\d{1,3}(?:\.\d{3})*,\d{2})', line)
-                        if match:
-                            amount = self._parse_turkish_amount(match.group(1))
-                            if amount and amount > 0:
-                                return amount
-                    else:
-                        # Find amount in this line
-                        for pattern in self.AMOUNT_PATTERNS:
-                            match = re.search(pattern, line, re.IGNORECASE)
-                            if match:
-                                amount = self._parse_turkish_amount(match.group(1))
-                                if amount and amount > 0:
-                                    return amount
-        
-        return None
+        return max(all_amounts) if all_amounts else None
 
     def _extract_doc_no(self, text: str) -> Optional[str]:
         """Extract document/receipt number."""
         for pattern in self.DOC_NO_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = pattern.search(text)
             if match:
-                return match.group(1)
+                return match.group(1).upper()
         return None
 
 
-# Singleton instance
-_extraction_service: Optional[ExtractionService] = None
-
-
+# Singleton instance; the patterns themselves are compiled when the class
+# body runs, at import
+@lru_cache
 def get_extraction_service() -> ExtractionService:
     """Get or create extraction service instance."""
-    global _extraction_service
-    if _extraction_service is None:
-        _extraction_service = ExtractionService()
-    return _extraction_service
+    return ExtractionService()
@@ -1,14 +1,15 @@
 """
 OCR Service using Tesseract with image preprocessing.
 """
-import io
+import asyncio
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
 import cv2
 import numpy as np
-from PIL import Image
 import pytesseract
 
 from app.config import get_settings
@@ -16,6 +17,18 @@ from app.config import get_settings
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Tesseract does its work in a child process and OpenCV releases the GIL, so
+# threads are enough to keep OCR off the event loop; the pool size caps how
+# many recognitions run at once. The pool already keeps every core busy, so
+# each tesseract process runs single-threaded (it inherits this environment)
+# instead of starting its own OpenMP threads on top
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+_ocr_executor = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1,
+    thread_name_prefix="ocr",
+)
+
 
 class OCRService:
     """
@@ -97,23 +110,31 @@ class OCRService:
             logger.error(f"Failed to detect languages: {e}. Defaulting to 'eng'.")
             self.ocr_config = r'--oem 3 --psm 6 -l eng'
 
+    # Longest side fed to Tesseract; phone photos are often 4000+ px
+    MAX_IMAGE_DIM = 1500
+
+    def _downscale(self, image: np.ndarray) -> np.ndarray:
+        """Shrink images larger than MAX_IMAGE_DIM, keeping the aspect ratio."""
+        height, width = image.shape[:2]
+        if max(height, width) <= self.MAX_IMAGE_DIM:
+            return image
+        scale = self.MAX_IMAGE_DIM / max(height, width)
+        return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
     def preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """
         Minimal preprocessing - Tesseract works better with clean input.
         Heavy preprocessing was causing garbage OCR output.
         """
-        # Convert to grayscale if needed
+        # Convert to grayscale if needed; nothing below writes into the
+        # array, so a grayscale input is used as is rather than copied
         if len(image.shape) == 3:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         else:
-            gray = image.copy()
+            gray = image
         
         # Resize very large images to speed up OCR
-        height, width = gray.shape[:2]
-        max_dim = 1500
-        if max(height, width) > max_dim:
-            scale = max_dim / max(height, width)
-            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = self._downscale(gray)
         
         # No other processing - Tesseract handles the rest better
         return gray
@@ -131,15 +152,13 @@ class OCRService:
             if lines is None:
                 return image
             
-            # Calculate the average angle
-            angles = []
-            for line in lines:
-                x1, y1, x2, y2 = line[0]
-                angle = np.arctan2(y2 - y1, x2 - x1) * 180 / np.pi
-                if -45 < angle < 45:  # Only consider near-horizontal lines
-                    angles.append(angle)
+            # Calculate the average angle, for all segments at once
+            x1, y1, x2, y2 = lines.reshape(-1, 4).T
+            angles = np.degrees(np.arctan2(y2 - y1, x2 - x1))
+            # Only consider near-horizontal lines
+            angles = angles[(angles > -45) & (angles < 45)]
             
-            if not angles:
+            if angles.size == 0:
                 return image
             
             median_angle = np.median(angles)
@@ -163,6 +182,18 @@ class OCRService:
             logger.warning(f"Deskew failed: {e}")
             return image
 
+    @staticmethod
+    def _join_lines(data: dict, indices: list[int]) -> str:
+        """
+        Rebuild text from image_to_data() output: words joined by spaces
+        within a line, lines joined by newlines.
+        """
+        lines: dict[tuple[int, int, int], list[str]] = {}
+        for i in indices:
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            lines.setdefault(key, []).append(data['text'][i].strip())
+        return "\n".join(" ".join(words) for words in lines.values())
+
     def extract_text(self, image_path: str) -> dict:
         """
         Extract text from an image file.
@@ -182,6 +213,10 @@ class OCRService:
             if image is None:
                 raise ValueError(f"Could not load image: {image_path}")
             
+            # Downscale once up front so the raw-image retry below does not
+            # hand Tesseract the full-resolution photo
+            image = self._downscale(image)
+            
             # Preprocess
             processed = self.preprocess_image(image)
             
@@ -215,6 +250,7 @@ class OCRService:
             # Extract text and calculate confidence
             words = []
             confidences = []
+            kept = []
             
             n_boxes = len(data['text'])
             for i in range(n_boxes):
@@ -222,6 +258,7 @@ class OCRService:
                 text = data['text'][i].strip()
                 
                 if text and conf > 0:
+                    kept.append(i)
                     words.append({
                         'text': text,
                         'confidence': conf,
@@ -235,8 +272,8 @@ class OCRService:
             # Calculate average confidence
             avg_confidence = sum(confidences) / len(confidences) if confidences else 0
             
-            # Reconstruct full text
-            full_text = " ".join([w['text'] for w in words])
+            # Reconstruct full text, one line per Tesseract line
+            full_text = self._join_lines(data, kept)
             
             # If still empty, return debug info
             if not full_text:
@@ -267,6 +304,11 @@ class OCRService:
                 'error': str(e),
             }
 
+    async def extract_text_async(self, image_path: str) -> dict:
+        """Run extract_text() in the OCR worker pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_ocr_executor, self.extract_text, image_path)
+
     def extract_text_from_bytes(self, image_bytes: bytes) -> dict:
         """
         Extract text from image bytes (for uploaded files).
@@ -288,26 +330,24 @@ class OCRService:
             # Preprocess
             processed = self.preprocess_image(image)
             
-            # OCR
-            full_text = pytesseract.image_to_string(
-                processed, 
-                config=self.ocr_config
-            )
-            
-            # Get confidence data
+            # OCR - a single Tesseract run gives both the text and the
+            # confidences
             data = pytesseract.image_to_data(
                 processed, 
                 config=self.ocr_config,
                 output_type=pytesseract.Output.DICT
             )
             
-            confidences = [int(c) for c in data['conf'] if int(c) > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+            confidences = np.asarray(data['conf'], dtype=np.int32)
+            confidences = confidences[confidences > 0]
+            avg_confidence = float(confidences.mean()) if confidences.size else 0
+            
+            kept = [i for i, t in enumerate(data['text']) if t.strip()]
             
             return {
-                'text': full_text.strip(),
+                'text': self._join_lines(data, kept),
                 'confidence': round(avg_confidence, 2),
-                'word_count': len([t for t in data['text'] if t.strip()]),
+                'word_count': len(kept),
             }
             
         except Exception as e:
@@ -4,13 +4,15 @@ Uses multiple matching strategies with configurable thresholds.
 """
 import re
 import logging
-from typing import Optional
+from typing import Optional, Sequence
 from dataclasses import dataclass
-from difflib import SequenceMatcher
+from functools import lru_cache
 from uuid import UUID
 
-from sqlalchemy import select, or_, func
+from rapidfuzz import fuzz
+from sqlalchemy import select, or_, func, literal, literal_column, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from app.models.vendor import Vendor, VendorAlias
 
@@ -42,8 +44,25 @@ class VendorMatcher:
     # Minimum similarity score for fuzzy matching
     FUZZY_THRESHOLD = 0.7
     
-    # Common suffixes to remove when normalizing
-    SUFFIXES_TO_REMOVE = [
+    # pg_trgm similarity a name needs to become a fuzzy candidate; well below
+    # the 0.3 default so OCR swaps in short names ('0PET' vs 'OPET' is 0.25)
+    # still reach the RapidFuzz scoring
+    TRIGRAM_THRESHOLD = 0.1
+    
+    # Best trigram-ranked vendors RapidFuzz re-scores per fuzzy lookup
+    FUZZY_CANDIDATES = 5
+    
+    # (match_type, confidence) per lookup priority in find_match()
+    LOOKUP_MATCHES = (
+        ('vkn', 1.0),
+        ('tckn', 1.0),
+        ('exact', 0.95),
+        ('alias', 0.9),
+    )
+    
+    # Common suffixes to remove when normalizing, compiled once; they are
+    # applied one after another, which stored normalized names depend on
+    SUFFIXES_TO_REMOVE = tuple(re.compile(p, re.IGNORECASE) for p in [
         r'\s*ltd\.?\s*şti\.?',
         r'\s*a\.?s\.?',
         r'\s*tic\.?\s*(?:ltd\.?\s*şti\.?)?',
@@ -53,7 +72,8 @@ class VendorMatcher:
         r'\s*group',
         r'\s*şirket(?:i)?',
         r'\s*market(?:i)?',
-    ]
+    ])
+    PUNCTUATION = re.compile(r'[^\w\s]')
 
     def normalize_name(self, name: str) -> str:
         """
@@ -67,27 +87,18 @@ class VendorMatcher:
         """
         if not name:
             return ""
-        
-        # Lowercase
-        normalized = name.lower()
-        
-        # Remove common suffixes
-        for suffix in self.SUFFIXES_TO_REMOVE:
-            normalized = re.sub(suffix, '', normalized, flags=re.IGNORECASE)
-        
-        # Remove punctuation except spaces
-        normalized = re.sub(r'[^\w\s]', '', normalized)
-        
-        # Collapse whitespace
-        normalized = ' '.join(normalized.split())
-        
-        return normalized.strip()
+        return _normalize_name(name)
 
-    def calculate_similarity(self, s1: str, s2: str) -> float:
-        """Calculate similarity ratio between two strings."""
+    def calculate_similarity(self, s1: str, s2: str, score_cutoff: float = 0.0) -> float:
+        """
+        Calculate similarity ratio between two strings.
+        
+        Scores below score_cutoff come back as 0.0, which lets RapidFuzz
+        give up on a pair early.
+        """
         if not s1 or not s2:
             return 0.0
-        return SequenceMatcher(None, s1, s2).ratio()
+        return fuzz.ratio(s1, s2, score_cutoff=score_cutoff * 100) / 100
 
     async def find_match(
         self,
@@ -110,107 +121,129 @@ class VendorMatcher:
         Returns:
             VendorMatch with result
         """
-        # 1. Try VKN match first (highest confidence)
+        normalized = self.normalize_name(vendor_name) if vendor_name else None
+        
+        # 1-4. VKN, TCKN, exact name and alias lookups go out as one UNION ALL;
+        # the hit with the best priority wins
+        lookups = []
         if vkn:
-            result = await db.execute(
-                select(Vendor).where(
-                    Vendor.user_id == user_id,
-                    Vendor.vkn == vkn
-                )
+            lookups.append(
+                select(Vendor.id, Vendor.display_name, literal(0).label("priority"))
+                .where(Vendor.user_id == user_id, Vendor.vkn == vkn)
             )
-            vendor = result.scalar_one_or_none()
-            if vendor:
-                return VendorMatch(
-                    vendor_id=vendor.id,
-                    vendor_name=vendor.display_name,
-                    match_type='vkn',
-                    confidence=1.0,
-                    is_new=False,
-                )
-        
-        # 2. Try TCKN match
         if tckn:
+            lookups.append(
+                select(Vendor.id, Vendor.display_name, literal(1).label("priority"))
+                .where(Vendor.user_id == user_id, Vendor.tckn == tckn)
+            )
+        if normalized:
+            lookups.append(
+                select(Vendor.id, Vendor.display_name, literal(2).label("priority"))
+                .where(Vendor.user_id == user_id, Vendor.normalized_name == normalized)
+            )
+            lookups.append(
+                select(Vendor.id, Vendor.display_name, literal(3).label("priority"))
+                .join(VendorAlias, Vendor.id == VendorAlias.vendor_id)
+                .where(Vendor.user_id == user_id, VendorAlias.normalized_alias == normalized)
+            )
+        
+        if lookups:
             result = await db.execute(
-                select(Vendor).where(
-                    Vendor.user_id == user_id,
-                    Vendor.tckn == tckn
-                )
+                union_all(*lookups).order_by(literal_column("priority")).limit(1)
             )
-            vendor = result.scalar_one_or_none()
-            if vendor:
-                return VendorMatch(
-                    vendor_id=vendor.id,
-                    vendor_name=vendor.display_name,
-                    match_type='tckn',
-                    confidence=1.0,
-                    is_new=False,
-                )
+            hit = result.first()
+            if hit:
+                return self._lookup_match(hit, hit.priority)
         
-        # If no name provided, no more matching possible
-        if not vendor_name:
-            return VendorMatch()
+        return await self._fuzzy_or_new(db, user_id, vendor_name, normalized)
+
+    async def find_matches(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        lookups: Sequence[tuple[Optional[str], Optional[str], Optional[str]]],
+    ) -> list[VendorMatch]:
+        """
+        find_match() for several (vendor_name, vkn, tckn) lookups at once.
         
-        normalized = self.normalize_name(vendor_name)
+        The VKN, TCKN, exact name and alias candidates of all lookups are
+        loaded in one query and resolved in memory with find_match()'s
+        priority; only the misses go through the fuzzy step.
+        """
+        normalized = [self.normalize_name(name) if name else None for name, _, _ in lookups]
+        names = {n for n in normalized if n}
+        vkns = {vkn for _, vkn, _ in lookups if vkn}
+        tckns = {tckn for _, _, tckn in lookups if tckn}
         
-        # 3. Try exact normalized name match
-        result = await db.execute(
-            select(Vendor).where(
-                Vendor.user_id == user_id,
-                Vendor.normalized_name == normalized
-            )
-        )
-        vendor = result.scalar_one_or_none()
-        if vendor:
-            return VendorMatch(
-                vendor_id=vendor.id,
-                vendor_name=vendor.display_name,
-                match_type='exact',
-                confidence=0.95,
-                is_new=False,
+        conditions = []
+        if vkns:
+            conditions.append(Vendor.vkn.in_(vkns))
+        if tckns:
+            conditions.append(Vendor.tckn.in_(tckns))
+        if names:
+            conditions.append(Vendor.normalized_name.in_(names))
+            conditions.append(Vendor.aliases.any(VendorAlias.normalized_alias.in_(names)))
+        
+        by_vkn: dict[str, Vendor] = {}
+        by_tckn: dict[str, Vendor] = {}
+        by_name: dict[str, Vendor] = {}
+        by_alias: dict[str, Vendor] = {}
+        if conditions:
+            result = await db.execute(
+                select(Vendor)
+                .where(Vendor.user_id == user_id, or_(*conditions))
+                .options(selectinload(Vendor.aliases))
             )
+            for vendor in result.scalars():
+                if vendor.vkn:
+                    by_vkn.setdefault(vendor.vkn, vendor)
+                if vendor.tckn:
+                    by_tckn.setdefault(vendor.tckn, vendor)
+                by_name.setdefault(vendor.normalized_name, vendor)
+                for alias in vendor.aliases:
+                    by_alias.setdefault(alias.normalized_alias, vendor)
         
-        # 4. Try alias match
-        result = await db.execute(
-            select(Vendor)
-            .join(VendorAlias, Vendor.id == VendorAlias.vendor_id)
-            .where(
-                Vendor.user_id == user_id,
-                VendorAlias.normalized_alias == normalized
+        matches = []
+        for (vendor_name, vkn, tckn), name in zip(lookups, normalized):
+            # Same order as the priorities in LOOKUP_MATCHES
+            hits = (
+                by_vkn.get(vkn) if vkn else None,
+                by_tckn.get(tckn) if tckn else None,
+                by_name.get(name) if name else None,
+                by_alias.get(name) if name else None,
             )
+            priority = next((i for i, hit in enumerate(hits) if hit), None)
+            if priority is not None:
+                matches.append(self._lookup_match(hits[priority], priority))
+            else:
+                matches.append(await self._fuzzy_or_new(db, user_id, vendor_name, name))
+        return matches
+
+    def _lookup_match(self, vendor, priority: int) -> VendorMatch:
+        """VendorMatch for a VKN/TCKN/exact/alias hit of the given priority."""
+        match_type, confidence = self.LOOKUP_MATCHES[priority]
+        return VendorMatch(
+            vendor_id=vendor.id,
+            vendor_name=vendor.display_name,
+            match_type=match_type,
+            confidence=confidence,
+            is_new=False,
         )
-        vendor = result.scalar_one_or_none()
-        if vendor:
-            return VendorMatch(
-                vendor_id=vendor.id,
-                vendor_name=vendor.display_name,
-                match_type='alias',
-                confidence=0.9,
-                is_new=False,
-            )
+
+    async def _fuzzy_or_new(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        vendor_name: Optional[str],
+        normalized: Optional[str],
+    ) -> VendorMatch:
+        """Last steps of find_match() once no VKN/TCKN/name/alias lookup hit."""
+        # If no name provided, no more matching possible
+        if not vendor_name:
+            return VendorMatch()
         
         # 5. Try fuzzy matching
-        result = await db.execute(
-            select(Vendor).where(Vendor.user_id == user_id)
-        )
-        all_vendors = result.scalars().all()
-        
-        best_match = None
-        best_score = 0.0
-        
-        for vendor in all_vendors:
-            # Check against display name
-            score = self.calculate_similarity(normalized, vendor.normalized_name)
-            if score > best_score:
-                best_score = score
-                best_match = vendor
-            
-            # Check against aliases
-            for alias in vendor.aliases:
-                alias_score = self.calculate_similarity(normalized, alias.normalized_alias)
-                if alias_score > best_score:
-                    best_score = alias_score
-                    best_match = vendor
-        
+        best_match, best_score = await self._fuzzy_match(db, user_id, normalized)
         if best_match and best_score >= self.FUZZY_THRESHOLD:
             return VendorMatch(
                 vendor_id=best_match.id,
@@ -226,6 +259,77 @@ class VendorMatcher:
             is_new=True,
         )
 
+    async def _fuzzy_match(
+        self,
+        db: AsyncSession,
+        user_id: UUID,
+        normalized: str,
+    ) -> tuple[Optional[Vendor], float]:
+        """
+        Return the user's most similar vendor and its score.
+        
+        The trigram GIN indexes narrow the vendors down to names sharing
+        enough trigrams (pg_trgm '%'), with the cut lowered to
+        TRIGRAM_THRESHOLD for this transaction. Postgres ranks them by their
+        best name/alias similarity and only the top FUZZY_CANDIDATES are
+        loaded for RapidFuzz to score.
+        """
+        await db.execute(
+            select(func.set_config(
+                "pg_trgm.similarity_threshold", str(self.TRIGRAM_THRESHOLD), True
+            ))
+        )
+        alias_similarity = (
+            select(func.max(func.similarity(VendorAlias.normalized_alias, normalized)))
+            .where(VendorAlias.vendor_id == Vendor.id)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(Vendor).where(
+                Vendor.user_id == user_id,
+                or_(
+                    Vendor.normalized_name.op("%")(normalized),
+                    Vendor.aliases.any(VendorAlias.normalized_alias.op("%")(normalized)),
+                ),
+            )
+            .order_by(
+                func.greatest(
+                    func.similarity(Vendor.normalized_name, normalized), alias_similarity
+                ).desc()
+            )
+            .limit(self.FUZZY_CANDIDATES)
+            .options(selectinload(Vendor.aliases))
+        )
+        return self._best_fuzzy_match(normalized, result.scalars().all())
+
+    def _best_fuzzy_match(
+        self,
+        normalized: str,
+        vendors: Sequence[Vendor],
+    ) -> tuple[Optional[Vendor], float]:
+        """
+        Return the most similar vendor (by name or alias) and its score.
+        
+        Only scores reaching FUZZY_THRESHOLD count, since nothing below it is
+        used; the search stops at a perfect score.
+        """
+        best_match = None
+        best_score = 0.0
+        
+        for vendor in vendors:
+            names = (vendor.normalized_name, *(a.normalized_alias for a in vendor.aliases))
+            for name in names:
+                score = self.calculate_similarity(
+                    normalized, name, max(best_score, self.FUZZY_THRESHOLD)
+                )
+                if score > best_score:
+                    best_score = score
+                    best_match = vendor
+                    if score >= 1.0:
+                        return best_match, best_score
+        
+        return best_match, best_score
+
     async def create_or_get_vendor(
         self,
         db: AsyncSession,
@@ -255,7 +359,9 @@ class VendorMatcher:
         
         if not match.is_new and match.vendor_id:
             result = await db.execute(
-                select(Vendor).where(Vendor.id == match.vendor_id)
+                select(Vendor)
+                .where(Vendor.id == match.vendor_id)
+                .options(selectinload(Vendor.aliases))
             )
             vendor = result.scalar_one()
             
@@ -263,7 +369,7 @@ class VendorMatcher:
             if add_alias_from:
                 normalized_alias = self.normalize_name(add_alias_from)
                 # Check if alias already exists
-                existing_aliases = [a.normalized_alias for a in vendor.aliases]
+                existing_aliases = {a.normalized_alias for a in vendor.aliases}
                 if normalized_alias not in existing_aliases and normalized_alias != vendor.normalized_name:
                     new_alias = VendorAlias(
                         vendor_id=vendor.id,
@@ -290,6 +396,28 @@ class VendorMatcher:
         return vendor
 
 
+@lru_cache(maxsize=4096)
+def _normalize_name(name: str) -> str:
+    """
+    VendorMatcher.normalize_name() body, memoized: the same OCR vendor names
+    come back on every receipt from that vendor.
+    """
+    # Lowercase
+    normalized = name.lower()
+    
+    # Remove common suffixes
+    for suffix in VendorMatcher.SUFFIXES_TO_REMOVE:
+        normalized = suffix.sub('', normalized)
+    
+    # Remove punctuation except spaces
+    normalized = VendorMatcher.PUNCTUATION.sub('', normalized)
+    
+    # Collapse whitespace
+    normalized = ' '.join(normalized.split())
+    
+    return normalized.strip()
+
+
 # Singleton instance
 _vendor_matcher: Optional[VendorMatcher] = None
 
@@ -1,18 +1,22 @@
 """
 Test configuration and fixtures.
 """
-import asyncio
 import os
-from typing import AsyncGenerator, Generator
+from pathlib import Path
+from typing import AsyncGenerator
 
 import pytest
 import pytest_asyncio
-from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
 from app.main import app
 from app.database import get_db, Base
+from app.middleware import RateLimiter, rate_limiter as rate_limiter_module
 from app.models import User, Vendor, Category
+from app.routers import documents as documents_module
+from app.services import ocr_service as ocr_service_module
+from app.services.ocr_service import OCRService
 
 
 # Test database URL
@@ -22,24 +26,22 @@ TEST_DATABASE_URL = os.getenv(
 )
 
 
-@pytest.fixture(scope="session")
-def event_loop() -> Generator:
-    """Create event loop for async tests."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
-
-
-@pytest_asyncio.fixture(scope="function")
+@pytest_asyncio.fixture(scope="session")
 async def db_engine():
-    """Create test database engine."""
+    """Create test database engine and schema once per test session."""
+    # Tests hold a single connection each, so no pre-ping on checkout; the
+    # database is disposable, so skip JIT planning for the tiny queries and
+    # don't wait for WAL flushes on commit
     engine = create_async_engine(
         TEST_DATABASE_URL,
         echo=False,
-        pool_pre_ping=True,
+        connect_args={
+            "server_settings": {"jit": "off", "synchronous_commit": "off"},
+        },
     )
     
     async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
     
     yield engine
@@ -52,30 +54,58 @@ async def db_engine():
 
 @pytest_asyncio.fixture(scope="function")
 async def db_session(db_engine) -> AsyncGenerator[AsyncSession, None]:
-    """Create test database session."""
-    async_session = async_sessionmaker(
-        db_engine,
-        class_=AsyncSession,
-        expire_on_commit=False,
-    )
+    """
+    Create test database session.
     
-    async with async_session() as session:
-        yield session
+    Each test runs inside a transaction that is rolled back afterwards;
+    commits made by fixtures and endpoints only release savepoints.
+    """
+    async with db_engine.connect() as conn:
+        trans = await conn.begin()
+        session = AsyncSession(
+            bind=conn,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+        
+        try:
+            yield session
+        finally:
+            await session.close()
+            await trans.rollback()
+
+
+@pytest.fixture(scope="session")
+def asgi_transport() -> ASGITransport:
+    """ASGI transport shared by every test client (it never runs the lifespan)."""
+    return ASGITransport(app=app)
+
+
+@pytest_asyncio.fixture(scope="session")
+async def session_client(asgi_transport: ASGITransport) -> AsyncGenerator[AsyncClient, None]:
+    """HTTP client shared by the whole test session; the app keeps no client state."""
+    async with AsyncClient(transport=asgi_transport, base_url="http://test") as ac:
+        yield ac
 
 
 @pytest_asyncio.fixture(scope="function")
-async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
+async def client(
+    session_client: AsyncClient, db_session: AsyncSession, monkeypatch
+) -> AsyncGenerator[AsyncClient, None]:
     """Create test HTTP client with database override."""
+    # Every test client starts with empty rate limit buckets, as if it were a
+    # new client; back-to-back tests would otherwise trip the burst limit
+    monkeypatch.setattr(rate_limiter_module, "rate_limiter", RateLimiter())
     
     async def override_get_db():
         yield db_session
     
     app.dependency_overrides[get_db] = override_get_db
     
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        yield ac
-    
-    app.dependency_overrides.clear()
+    try:
+        yield session_client
+    finally:
+        app.dependency_overrides.pop(get_db, None)
 
 
 @pytest_asyncio.fixture
@@ -90,7 +120,6 @@ async def test_user(db_session: AsyncSession) -> User:
     )
     db_session.add(user)
     await db_session.commit()
-    await db_session.refresh(user)
     return user
 
 
@@ -105,7 +134,6 @@ async def test_vendor(db_session: AsyncSession, test_user: User) -> Vendor:
     )
     db_session.add(vendor)
     await db_session.commit()
-    await db_session.refresh(vendor)
     return vendor
 
 
@@ -116,7 +144,28 @@ async def test_categories(db_session: AsyncSession, test_user: User) -> list[Cat
         Category(user_id=test_user.id, name="Market", icon="🛒", color="#22c55e"),
         Category(user_id=test_user.id, name="Restoran", icon="🍽️", color="#f59e0b"),
     ]
-    for cat in categories:
-        db_session.add(cat)
+    db_session.add_all(categories)
     await db_session.commit()
     return categories
+
+
+@pytest.fixture
+def ocr_calls(monkeypatch, tmp_path) -> list[str]:
+    """
+    Stub out Tesseract for upload tests.
+    
+    Uploads are stored under tmp_path and "OCR" returns the uploaded bytes
+    as text; the returned list records every image path sent to OCR.
+    """
+    calls: list[str] = []
+    
+    async def extract_text_async(self, image_path: str) -> dict:
+        calls.append(image_path)
+        text = Path(image_path).read_text()
+        return {"text": text, "confidence": 90.0, "words": [], "word_count": len(text.split())}
+    
+    monkeypatch.setattr(documents_module.settings, "upload_dir", str(tmp_path))
+    monkeypatch.setattr(OCRService, "extract_text_async", extract_text_async)
+    # Skip the tesseract binary and language probing in OCRService.__init__
+    monkeypatch.setattr(ocr_service_module, "_ocr_service", object.__new__(OCRService))
+    return calls
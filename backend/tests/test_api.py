@@ -3,6 +3,10 @@ Tests for health and document endpoints.
 """
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from app.models import Document, User, Vendor
+from app.routers.documents import MAX_BATCH_FILES
 
 
 class TestHealthEndpoint:
@@ -58,6 +62,96 @@ class TestDocumentsEndpoint:
         assert response.status_code == 400
         assert "not allowed" in response.json()["detail"].lower()
 
+    @pytest.mark.asyncio
+    async def test_upload_duplicate_skips_ocr(self, client: AsyncClient, db_session, test_user, ocr_calls):
+        """Test re-uploading the same bytes returns the existing draft without OCR."""
+        files = {"file": ("receipt.png", "MİGROS A.Ş.\nTOPLAM: 50,00 TL".encode(), "image/png")}
+        
+        first = await client.post("/documents/upload", files=files)
+        assert first.status_code == 200
+        second = await client.post("/documents/upload", files=files)
+        assert second.status_code == 200
+        
+        assert len(ocr_calls) == 1
+        details = second.json()["extraction_details"]
+        assert details["is_duplicate"] is True
+        assert details["document_id"] == first.json()["extraction_details"]["document_id"]
+        assert second.json()["total_gross"] == first.json()["total_gross"]
+        
+        count = await db_session.scalar(
+            select(func.count()).select_from(Document).where(Document.user_id == test_user.id)
+        )
+        assert count == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_upload(self, client: AsyncClient, db_session, test_user, ocr_calls):
+        """Test batch upload keeps upload order and OCRs in-batch duplicates once."""
+        migros = "MİGROS A.Ş.\nTOPLAM: 50,00 TL".encode()
+        bim = "BİM A.Ş.\nTOPLAM: 20,00 TL".encode()
+        files = [
+            ("files", ("a.png", migros, "image/png")),
+            ("files", ("b.png", bim, "image/png")),
+            ("files", ("c.png", migros, "image/png")),
+        ]
+        
+        response = await client.post("/documents/batch-upload", files=files)
+        assert response.status_code == 200
+        drafts = response.json()
+        
+        assert [d["vendor_name"] for d in drafts] == ["MİGROS A.Ş.", "BİM A.Ş.", "MİGROS A.Ş."]
+        assert [d["total_gross"] for d in drafts] == ["50.00", "20.00", "50.00"]
+        document_ids = [d["extraction_details"]["document_id"] for d in drafts]
+        assert document_ids[0] == document_ids[2] != document_ids[1]
+        assert len(ocr_calls) == 2
+        
+        count = await db_session.scalar(
+            select(func.count()).select_from(Document).where(Document.user_id == test_user.id)
+        )
+        assert count == 2
+
+    @pytest.mark.asyncio
+    async def test_upload_paths_match_vendor_alike(self, client: AsyncClient, db_session, test_user, ocr_calls):
+        """Test single and batch uploads match an OCR-garbled vendor like find_match."""
+        vendor = Vendor(user_id=test_user.id, display_name="OPET", normalized_name="opet")
+        db_session.add(vendor)
+        await db_session.commit()
+        
+        single = await client.post(
+            "/documents/upload",
+            files={"file": ("a.png", "0PET\nTOPLAM: 10,00 TL".encode(), "image/png")},
+        )
+        batch = await client.post(
+            "/documents/batch-upload",
+            files=[("files", ("b.png", "0PET\nTOPLAM: 20,00 TL".encode(), "image/png"))],
+        )
+        
+        for draft in (single.json(), batch.json()[0]):
+            assert draft["suggested_vendor_id"] == str(vendor.id)
+            assert draft["extraction_details"]["vendor_match_type"] == "fuzzy"
+
+    @pytest.mark.asyncio
+    async def test_batch_upload_rejects_before_saving(self, client: AsyncClient, test_user, ocr_calls, tmp_path):
+        """Test a disallowed file rejects the whole batch before anything is stored."""
+        files = [
+            ("files", ("a.png", b"TOPLAM: 50,00 TL", "image/png")),
+            ("files", ("b.txt", b"hello world", "text/plain")),
+        ]
+        response = await client.post("/documents/batch-upload", files=files)
+        assert response.status_code == 400
+        assert list(tmp_path.iterdir()) == []
+        assert ocr_calls == []
+
+    @pytest.mark.asyncio
+    async def test_batch_upload_too_many_files(self, client: AsyncClient, test_user, ocr_calls):
+        """Test batches over MAX_BATCH_FILES are rejected."""
+        files = [
+            ("files", (f"{i}.png", f"TOPLAM: {i},00 TL".encode(), "image/png"))
+            for i in range(MAX_BATCH_FILES + 1)
+        ]
+        response = await client.post("/documents/batch-upload", files=files)
+        assert response.status_code == 400
+        assert ocr_calls == []
+
 
 class TestVendorsEndpoint:
     """Tests for vendor endpoints."""
@@ -91,6 +185,45 @@ class TestVendorsEndpoint:
         data = response.json()
         assert isinstance(data, list)
 
+    @pytest.mark.asyncio
+    async def test_update_vendor_duplicate_vkn(self, client: AsyncClient, db_session, test_vendor):
+        """Test moving a vendor onto another vendor's VKN is a 400, not a 500."""
+        vendor = Vendor(user_id=test_vendor.user_id, display_name="Second", normalized_name="second")
+        db_session.add(vendor)
+        await db_session.commit()
+        # The endpoint's rollback expires the objects of the shared test session
+        url = f"/vendors/{vendor.id}"
+        
+        response = await client.patch(url, json={"vkn": test_vendor.vkn})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Vendor with this VKN already exists"
+        
+        response = await client.patch(url, json={"vkn": "1112223334"})
+        assert response.status_code == 200
+        assert response.json()["vkn"] == "1112223334"
+
+    @pytest.mark.asyncio
+    async def test_other_users_vendor_hidden(self, client: AsyncClient, db_session, test_user):
+        """Test vendor endpoints neither read nor change another user's vendors."""
+        other = User(name="Other User", email="other@example.com", is_active=True)
+        db_session.add(other)
+        await db_session.flush()
+        vendor = Vendor(user_id=other.id, display_name="Other Shop", normalized_name="other shop")
+        db_session.add(vendor)
+        await db_session.commit()
+        
+        search = await client.get("/vendors/search", params={"q": "other"})
+        assert search.status_code == 200
+        assert search.json() == []
+        
+        assert (await client.get(f"/vendors/{vendor.id}")).status_code == 404
+        assert (await client.patch(f"/vendors/{vendor.id}", json={"display_name": "Mine"})).status_code == 404
+        assert (await client.patch(f"/vendors/{vendor.id}", json={})).status_code == 404
+        assert (await client.post(f"/vendors/{vendor.id}/aliases", params={"alias_name": "x"})).status_code == 404
+        
+        await db_session.refresh(vendor)
+        assert vendor.display_name == "Other Shop"
+
 
 class TestLedgerEndpoint:
     """Tests for ledger endpoints."""
@@ -134,6 +267,31 @@ class TestReportsEndpoint:
         data = response.json()
         assert isinstance(data, list)
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("path", [
+        "/reports/summary",
+        "/reports/summary?period=custom",
+        "/reports/by-vendor",
+    ])
+    async def test_report_etag(self, client: AsyncClient, test_vendor, path):
+        """Test reports answer a matching If-None-Match with 304 until the data changes."""
+        entry = {"direction": "expense", "amount": "10.00", "vendor_id": str(test_vendor.id)}
+        await client.post("/ledger/entries", json=entry)
+        
+        response = await client.get(path)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        
+        cached = await client.get(path, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+        
+        await client.post("/ledger/entries", json=entry)
+        changed = await client.get(path, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+
     @pytest.mark.asyncio
     async def test_export_csv(self, client: AsyncClient, test_user):
         """Test CSV export."""
@@ -26,7 +26,7 @@ try:
     # Try to run version check
     import subprocess
     try:
-        result = subprocess.run([cmd, "--version"], capture_output=True, text=True)
+        result = subprocess.run([cmd, "--version"], capture_output=True, text=True, timeout=5)
         print(f"[VERSION OUTPUT]\n{result.stdout}")
     except Exception as e:
         print(f"[FAILURE] Could not run tesseract: {e}")